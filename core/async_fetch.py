@@ -0,0 +1,212 @@
+import asyncio
+import concurrent.futures
+import logging
+import time
+from typing import Callable, List
+
+from core.cache import ResponseCache
+from core.metrics import ScrapeMetrics, wire_bytes
+from core.rate_limiter import TokenBucket
+
+try:
+    import httpx
+except ImportError:  # only needed for ENGINE: async
+    httpx = None
+
+
+class AsyncFetcher:
+    """Fetches review pages on a single event loop with httpx.
+
+    Unlike the ThreadPoolExecutor path, the number of in-flight requests is not tied
+    to the number of threads, so one worker can keep hundreds of requests open.
+    """
+
+    def __init__(
+        self,
+        headers: dict,
+        max_concurrency: int = 10,
+        timeout: float = 30,
+        max_retries: int = 3,
+        rate_limiter: TokenBucket = None,
+        logger: logging.Logger = None,
+        cache: ResponseCache = None,
+        metrics: ScrapeMetrics = None,
+    ):
+        """
+        Args:
+            headers: default headers sent with every request
+            max_concurrency: maximum number of requests in flight at a time
+            timeout: timeout in seconds of a single request
+            max_retries: maximum number of attempts per page
+            rate_limiter: limiter shared with the rest of the fetch path. Not limited when None
+            logger: logger of the calling Scrape object
+            cache: on-disk cache of the pages. Not cached when None
+            metrics: metrics of the calling Scrape object, records the requests
+        """
+        if httpx is None:
+            raise ImportError(
+                "ENGINE 'async' requires httpx. Install it with 'pip install httpx'"
+            )
+
+        self._headers = headers
+        self._max_concurrency = max_concurrency
+        self._timeout = timeout
+        self._max_retries = max_retries
+        self._rate_limiter = rate_limiter
+        self.logger = logger or logging.getLogger()
+        self._cache = cache
+        self._metrics = metrics
+
+    def client(self) -> "httpx.AsyncClient":
+        """Returns a new pooled client, keeping at most max_concurrency connections"""
+        limits = httpx.Limits(
+            max_connections=self._max_concurrency,
+            max_keepalive_connections=self._max_concurrency,
+        )
+        return httpx.AsyncClient(
+            headers=self._headers,
+            limits=limits,
+            timeout=httpx.Timeout(self._timeout),
+        )
+
+    async def fetch(
+        self,
+        client: "httpx.AsyncClient",
+        semaphore: asyncio.Semaphore,
+        url_dict: dict,
+    ) -> dict:
+        """Returns the response of the passed url, retrying on non 200 responses
+
+        Args:
+            client: client used to send the request
+            semaphore: bounds the number of requests in flight
+            url_dict: dict containing the url and idx/offset_param of the page
+
+        Returns:
+            {"idx": idx, "response": httpx.Response}
+        """
+        response = None
+        url = url_dict["url"]
+        idx = url_dict["idx"]
+
+        entry = None
+        if self._cache is not None:
+            entry = await asyncio.to_thread(self._cache.lookup, url)
+            if entry is not None and entry.is_fresh(self._cache.ttl):
+                response = await asyncio.to_thread(self._cache.load, url, entry)
+                if response is not None:
+                    return {"idx": idx, "response": response}
+                entry = None  # evicted since lookup, fetched like a miss
+        # a stale page is revalidated, the server answers 304 when it did not change
+        validators = entry.validators() if entry is not None else {}
+
+        retry_count = 1
+        while retry_count <= self._max_retries:
+            try:
+                async with semaphore:
+                    if self._rate_limiter is not None:
+                        await self._rate_limiter.acquire_async()
+                    _start = time.perf_counter()
+                    response = await client.get(url, headers=validators)
+            except httpx.TransportError as ex:
+                if retry_count >= self._max_retries:
+                    raise
+                self.logger.warning(f"Retrying {retry_count} ... {url} ({ex!r})")
+                retry_count += 1
+                continue
+
+            if self._rate_limiter is not None:
+                self._rate_limiter.feedback(response.status_code)
+            if self._metrics is not None:
+                self._metrics.request_done(
+                    response.status_code,
+                    time.perf_counter() - _start,
+                    wire_bytes(response),
+                )
+
+            if response.status_code == 304 and entry is not None:
+                cached = await asyncio.to_thread(self._cache.load, url, entry, True)
+                if cached is not None:
+                    response = cached
+                    break
+                # evicted while the request was in flight, fetched again in full
+                entry, validators = None, {}
+                continue
+
+            if response.status_code == 200:
+                if self._cache is not None:
+                    await asyncio.to_thread(
+                        self._cache.store, url, response.content, response.headers
+                    )
+                break
+
+            self.logger.warning(f"Retrying {retry_count} ... {url}")
+            if self._metrics is not None:
+                self._metrics.retried(response.status_code)
+            retry_count += 1
+
+        return {"idx": idx, "response": response}
+
+    async def fetch_all(
+        self,
+        ls_urls: List[dict],
+        on_result: Callable[[dict], object] = None,
+        max_pending: int = None,
+    ) -> List[dict]:
+        """Fetches all the urls concurrently
+
+        Args:
+            ls_urls: list containing url and idx/offset_param of each reviews page
+            on_result: when passed, it is called in a worker thread with every {"idx", "response"}
+                as soon as it arrives (so it can block without stalling the loop), and the
+                responses are not kept
+            max_pending: with on_result, at most this many pages are downloaded and not
+                processed yet. A slot is taken before the request goes out, and on_result is
+                called on the loop instead (it must not block): when it returns a
+                concurrent.futures.Future (e.g. the parsing of the page), the slot is held
+                until it is done
+
+        Returns:
+            list of {"idx", "response"} in the same order as ls_urls. Empty when on_result is passed
+        """
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+        slots = asyncio.Semaphore(max_pending) if max_pending else None
+
+        async def fetch(url_dict: dict):
+            if slots is None:
+                res_dict = await self.fetch(client, semaphore, url_dict)
+                if on_result is None:
+                    return res_dict
+                await asyncio.to_thread(on_result, res_dict)
+                return
+
+            async with slots:  # no request goes out while max_pending pages are pending
+                res_dict = await self.fetch(client, semaphore, url_dict)
+                pending = on_result(res_dict)
+                del res_dict  # the response is only referenced by the pending work
+                if isinstance(pending, concurrent.futures.Future):
+                    await asyncio.wait([asyncio.wrap_future(pending)])
+
+        tasks = []
+        async with self.client() as client:
+            try:
+                for url_dict in ls_urls:
+                    tasks.append(asyncio.create_task(fetch(url_dict)))
+
+                results = await asyncio.gather(*tasks)
+                return list(results) if on_result is None else []
+            finally:
+                # on error/cancellation do not leave requests running on a closed client
+                for task in tasks:
+                    task.cancel()
+
+    def run(
+        self,
+        ls_urls: List[dict],
+        on_result: Callable[[dict], object] = None,
+        max_pending: int = None,
+    ) -> List[dict]:
+        """Blocking wrapper around fetch_all, runs it on a new event loop"""
+        return asyncio.run(
+            self.fetch_all(ls_urls, on_result=on_result, max_pending=max_pending)
+        )
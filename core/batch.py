@@ -0,0 +1,299 @@
+import collections
+import concurrent.futures
+import csv
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Iterator, List, Tuple
+
+from core.data_models import Config
+from core.parser import parse_page
+from core.review import intern_reviews
+from core.scrape import Scrape
+from core.workers import get_parse_pool
+
+# optional manifest columns, passed to the Input of the hotel as review filters
+FILTER_COLUMNS = (
+    "language",
+    "customer_type",
+    "score",
+    "time_of_year",
+    "since",
+    "until",
+)
+
+
+class _HotelJob:
+    """State of one hotel of the batch"""
+
+    def __init__(self, row: dict):
+        self.row = row
+        self.scrape: Scrape = None
+        self.ls_urls: List[dict] = []
+        self.pages: List[dict] = []  # parsed pages, in completion order
+        self.remaining = 0  # pages not parsed yet
+        self.n_reviews = 0
+        self.error: str = None
+        self.started = time.time()
+
+
+class BatchRunner:
+    """Scrapes the hotels of a manifest through one shared fetch pool and one shared
+    parse pool.
+
+    All the hotels share the same sessions and rate limiter, so REQUESTS_PER_SECOND is a
+    global limit. Pages are scheduled round robin across the hotels, so that a hotel with
+    hundreds of pages does not hold back the small ones. Only BATCH_ACTIVE_HOTELS hotels
+    are scheduled at a time, so memory does not grow with the size of the manifest.
+    Every hotel is saved and logged as soon as its last page is parsed.
+    """
+
+    def __init__(
+        self,
+        manifest: List[dict],
+        save_data_to_disk=True,
+        logger=None,
+        config: Config = None,
+    ) -> None:
+        """
+        Args:
+            manifest: list of {"hotel_name", "country", "sort_by", "n_reviews"}, see load_manifest
+            save_data_to_disk: whether to save the reviews of each hotel to OUTPUT_DIR
+            logger: logger passed to every Scrape object
+            config: already loaded config. config.yml is loaded when None
+        """
+        if "job_id" not in os.environ:
+            os.environ["job_id"] = str(datetime.now().strftime("%Y_%m_%d_%H_%M_%S"))
+
+        if logger is not None:
+            self.logger = logger
+        else:
+            Scrape._get_logger()
+            self.logger = logging.getLogger()
+
+        self._manifest = [self._normalize_row(row) for row in manifest]
+        self._save_data_to_disk = save_data_to_disk
+
+        self._config = config if config is not None else Scrape._load_config()
+
+        self._sessions = Scrape.create_session_pool(self._config)
+        self._rate_limiter = Scrape.create_rate_limiter(self._config)
+        self._cache = Scrape.create_response_cache(self._config)
+
+        self._lock = threading.Lock()
+        self._n_finished = 0
+        self._all_finished = threading.Event()
+
+    @staticmethod
+    def load_manifest(path: str) -> List[dict]:
+        """Reads a CSV (with header) or JSONL manifest with the columns:
+        hotel_name (or hotel), country, sort_by (optional), n_reviews (optional) and the
+        review filters language, customer_type, score, time_of_year (optional)
+
+        Args:
+            path: path of the .csv or .jsonl file
+
+        Returns:
+            list of rows
+        """
+        with open(path, "r", newline="") as file:
+            if path.endswith(".jsonl"):
+                rows = [json.loads(line) for line in file if line.strip()]
+            else:
+                rows = list(csv.DictReader(file))
+
+        return [BatchRunner._normalize_row(row) for row in rows]
+
+    @staticmethod
+    def _normalize_row(row: dict) -> dict:
+        """Fills the optional columns of a manifest row with their defaults"""
+        return {
+            "hotel_name": str(row.get("hotel_name") or row.get("hotel")).strip(),
+            "country": str(row["country"]).strip(),
+            "sort_by": str(row.get("sort_by") or "most_relevant").strip(),
+            "n_reviews": int(row.get("n_reviews") or -1),
+            **{c: str(row[c]).strip() for c in FILTER_COLUMNS if row.get(c)},
+        }
+
+    def _plan(self, job: _HotelJob):
+        """Creates the Scrape object of a hotel, sharing the batch resources, and its
+        list of urls (one request for the max offset)
+        """
+        row = job.row
+        try:
+            job.scrape = Scrape(
+                {
+                    "hotel_name": row["hotel_name"],
+                    "country": row["country"],
+                    "sort_by": row["sort_by"],
+                    "n_rows": row["n_reviews"],
+                    **{c: row[c] for c in FILTER_COLUMNS if c in row},
+                },
+                save_data_to_disk=self._save_data_to_disk,
+                logger=self.logger,
+                config=self._config,
+                sessions=self._sessions,
+                rate_limiter=self._rate_limiter,
+                cache=self._cache,
+            )
+            job.started = time.time()
+            job.ls_urls = job.scrape._limit_urls(
+                job.scrape._window_urls(job.scrape._create_urls())
+            )
+            job.remaining = len(job.ls_urls)
+        except Exception as ex:
+            job.error = repr(ex)
+            self.logger.error(f"Planning failed {row['hotel_name']}: {ex!r}")
+
+    def _schedule(
+        self, jobs: List[_HotelJob], executor: concurrent.futures.Executor
+    ) -> Iterator[Tuple[_HotelJob, dict]]:
+        """Yields (job, url_dict) of the pages to fetch, taking one page of each active
+        hotel in turn. The next hotels are planned in the executor while the active ones
+        are fetched.
+        """
+        n_active = self._config.BATCH_ACTIVE_HOTELS
+        jobs_iter = iter(jobs)
+        planning = collections.deque(
+            (job, executor.submit(self._plan, job))
+            for job in itertools.islice(jobs_iter, n_active)
+        )
+        active = collections.deque()  # (job, iterator on the urls not submitted yet)
+
+        while active or planning:
+            # top up the active hotels with the planned ones
+            while planning and len(active) < n_active:
+                job, f = planning.popleft()
+                f.result()
+                next_job = next(jobs_iter, None)
+                if next_job is not None:
+                    planning.append((next_job, executor.submit(self._plan, next_job)))
+
+                if job.error is not None or job.remaining == 0:
+                    self._finish(job)
+                else:
+                    active.append((job, iter(job.ls_urls)))
+
+            if not active:
+                continue
+
+            job, urls = active.popleft()
+            url_dict = next(urls, None)
+            if url_dict is not None:
+                yield job, url_dict
+                active.append((job, urls))
+
+    def _finish(self, job: _HotelJob):
+        """Saves the reviews of a completed hotel and reports it"""
+        reviews = []
+        if job.error is None:
+            # so that the reviews of the first page, come first
+            for page in sorted(job.pages, key=lambda x: x["idx"]):
+                reviews.extend(job.scrape._filter_window(page["reviews"]))
+            if job.scrape.input_params.n_rows > -1:
+                reviews = reviews[: job.scrape.input_params.n_rows]
+
+            try:
+                if self._save_data_to_disk:
+                    job.scrape._save_local_files(reviews)
+            except Exception as ex:
+                job.error = repr(ex)
+
+        if job.scrape is not None:  # None when planning failed
+            job.scrape._metrics.finish()
+            job.scrape._write_metrics_file()
+
+        job.n_reviews = len(reviews)
+        job.pages = []  # release the memory of the hotel
+
+        with self._lock:
+            self._n_finished += 1
+            n_finished = self._n_finished
+            if n_finished == len(self._manifest):
+                self._all_finished.set()
+
+        status = "Failed" if job.error else "Completed"
+        self.logger.info(
+            f"{status} {job.row['hotel_name']} ({job.row['country']}) [{n_finished}/{len(self._manifest)}]: "
+            f"{job.n_reviews} reviews in {time.time() - job.started:.1f} seconds"
+        )
+
+    def run(self) -> List[dict]:
+        """Scrapes all the hotels of the manifest
+
+        Returns:
+            one summary per hotel: {"hotel_name", "country", "sort_by", "n_reviews", "error"}
+            where n_reviews is the number of reviews found
+        """
+        _start = time.time()
+        jobs = [_HotelJob(row) for row in self._manifest]
+        if not jobs:
+            self._all_finished.set()
+
+        # at most this many pages are downloaded but not parsed yet, across all hotels
+        parse_slots = threading.BoundedSemaphore(self._config.PARSE_QUEUE_SIZE)
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self._config.MAX_CONCURRENCY
+        ) as executor:
+
+            def on_parsed(job: _HotelJob, f: concurrent.futures.Future):
+                parse_slots.release()
+                page = None
+                if f.exception() is None:
+                    page = f.result()
+                    # the pages of a hotel are held until it completes, share their strings
+                    page["reviews"] = intern_reviews(page["reviews"])
+                with self._lock:
+                    if page is None:
+                        job.error = job.error or repr(f.exception())
+                    else:
+                        job.pages.append(page)
+                        job.scrape._metrics.page_parsed(page)
+                    job.remaining -= 1
+                    done = job.remaining == 0
+                if done:
+                    executor.submit(self._finish, job)
+
+            def fetch(job: _HotelJob, url_dict: dict):
+                try:
+                    res_dict = job.scrape._scrape(url_dict)
+                    # not kept for the batch: a pool broken by a dead worker is replaced
+                    pool = get_parse_pool(self._config.PARSE_POOL_SIZE)
+                    f = pool.submit(
+                        parse_page,
+                        res_dict["idx"],
+                        res_dict["response"].content,
+                        job.scrape._parser_backend,
+                    )
+                except Exception as ex:
+                    f = concurrent.futures.Future()
+                    f.set_exception(ex)
+                f.add_done_callback(lambda f: on_parsed(job, f))
+
+            for job, url_dict in self._schedule(jobs, executor):
+                parse_slots.acquire()  # wait while PARSE_QUEUE_SIZE pages are pending
+                executor.submit(fetch, job, url_dict)
+
+            # the executor can only shut down once every _finish has been submitted
+            self._all_finished.wait()
+
+        self._sessions.close()
+        self.logger.info(
+            f"Batch complete: {len(jobs)} hotels in {time.time() - _start:.1f} seconds"
+        )
+
+        return [
+            {
+                "hotel_name": job.row["hotel_name"],
+                "country": job.row["country"],
+                "sort_by": job.row["sort_by"],
+                "n_reviews": job.n_reviews,
+                "error": job.error,
+            }
+            for job in jobs
+        ]
@@ -0,0 +1,266 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class CachedResponse:
+    """Response served from the cache, it has the attributes of a requests/httpx response
+    that the scraper uses
+    """
+
+    def __init__(self, url: str, content: bytes, headers: dict = None):
+        self.url = url
+        self.content = content
+        self.headers = headers or {}
+        self.status_code = 200
+
+
+class CacheEntry:
+    """Metadata of a cached page"""
+
+    def __init__(self, meta: dict, path: str):
+        self.meta = meta
+        self.path = path  # path of the gzipped html
+
+    @property
+    def size(self) -> int:
+        return self.meta["size"]
+
+    def is_fresh(self, ttl: Optional[float]) -> bool:
+        """Whether the page can be used without asking the server"""
+        return ttl is None or time.time() - self.meta["stored_at"] < ttl
+
+    def validators(self) -> dict:
+        """Headers of a conditional request revalidating the page"""
+        headers = {}
+        if self.meta.get("etag"):
+            headers["If-None-Match"] = self.meta["etag"]
+        if self.meta.get("last_modified"):
+            headers["If-Modified-Since"] = self.meta["last_modified"]
+        return headers
+
+
+class ResponseCache:
+    """On-disk cache of the review pages, keyed on the url of the page.
+
+    Each page is stored gzipped under a sha1 of its url, next to a small JSON file with
+    the time it was stored and its ETag/Last-Modified headers. A page younger than ttl is
+    served without any request. An older one is revalidated with a conditional request
+    when the server sent validators, and refetched otherwise. When the cache grows over
+    max_bytes, the least recently used pages are deleted.
+
+    It is thread safe, and can be shared by the Scrape objects of a process.
+
+    The same files are used to record a scrape and replay it offline (see MODES).
+    """
+
+    # cache: serve fresh pages from disk, fetch/revalidate the others
+    # record: always fetch, and keep every page (no eviction)
+    # replay: never fetch, a page that was not recorded is an error
+    MODES = ("cache", "record", "replay")
+
+    def __init__(
+        self,
+        directory: str,
+        ttl: float = None,
+        max_bytes: int = None,
+        mode: str = "cache",
+    ):
+        """
+        Args:
+            directory: directory of the cache files
+            ttl: seconds during which a page is served without request. None: forever
+            max_bytes: maximum size of the cached (gzipped) pages. None: unbounded
+            mode: one of MODES
+        """
+        if mode not in self.MODES:
+            raise ValueError(
+                f"Unknown cache mode '{mode}', expected one of {self.MODES}"
+            )
+
+        self.directory = directory
+        self.mode = mode
+        # recorded pages are never evicted, replayed ones never expire
+        self.ttl = None if mode == "replay" else ttl
+        self.max_bytes = None if mode != "cache" else max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0  # stale pages confirmed by a 304 response
+        self.misses = 0
+
+        # key -> [size, last use], the least recently used pages are evicted first
+        self._index: Dict[str, list] = {}
+        self._total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.endswith(".html.gz"):
+                stat = os.stat(os.path.join(directory, name))
+                self._index[name[: -len(".html.gz")]] = [stat.st_size, stat.st_mtime]
+                self._total_bytes += stat.st_size
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha1(url.encode()).hexdigest()
+
+    def _paths(self, key: str):
+        base = os.path.join(self.directory, key)
+        return f"{base}.html.gz", f"{base}.json"
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        """Returns the cache entry of url, None when it is not cached (always None when
+        recording). Raises KeyError when replaying a page that was not recorded
+        """
+        if self.mode == "record":
+            return None
+
+        key = self._key(url)
+        html_path, meta_path = self._paths(key)
+        with self._lock:
+            if key not in self._index:
+                if self.mode == "replay":
+                    raise KeyError(f"Page not recorded in {self.directory}: {url}")
+                return None
+        try:
+            with open(meta_path, "r") as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            return None
+        return CacheEntry(meta, html_path)
+
+    def load(
+        self, url: str, entry: CacheEntry, revalidated=False
+    ) -> Optional[CachedResponse]:
+        """Reads the html of a cache entry and marks it as recently used
+
+        Args:
+            url: url of the page
+            entry: entry returned by lookup
+            revalidated: whether the server just confirmed the page (304), so that it
+                is fresh again for ttl seconds
+
+        Returns:
+            the cached response, None when the page was evicted since lookup (by another
+            thread storing a page). The page must then be fetched without validators
+        """
+        try:
+            with open(entry.path, "rb") as file:
+                content = gzip.decompress(file.read())
+        except (OSError, EOFError):
+            return None
+
+        key = self._key(url)
+        now = time.time()
+        with self._lock:
+            cached = key in self._index
+            if cached:
+                self._index[key][1] = now
+            if revalidated:
+                self.revalidated += 1
+            else:
+                self.hits += 1
+
+        if cached:
+            try:
+                if revalidated:
+                    entry.meta["stored_at"] = now
+                    self._write_meta(self._paths(key)[1], entry.meta)
+                os.utime(entry.path, (now, now))  # keeps the LRU order across runs
+            except OSError:
+                pass  # evicted meanwhile, the content read is still valid
+
+        return CachedResponse(url, content, {"X-Cache": "HIT"})
+
+    def store(self, url: str, content: bytes, headers: dict):
+        """Caches the html of a 200 response, evicting the least recently used pages
+        when the cache is full
+
+        Args:
+            url: url of the page
+            content: html of the page
+            headers: response headers, for the ETag/Last-Modified validators
+        """
+        key = self._key(url)
+        html_path, meta_path = self._paths(key)
+        data = gzip.compress(content, compresslevel=6)
+        meta = {
+            "url": url,
+            "stored_at": time.time(),
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "size": len(data),
+        }
+
+        # written to a temporary file first, so that a page is never half written
+        tmp_path = f"{html_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, html_path)
+        self._write_meta(meta_path, meta)
+
+        with self._lock:
+            self.misses += 1
+            previous = self._index.get(key)
+            if previous is not None:
+                self._total_bytes -= previous[0]
+            self._index[key] = [len(data), time.time()]
+            self._total_bytes += len(data)
+            evicted = self._evict()
+
+        for old_key in evicted:
+            for path in self._paths(old_key):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _write_meta(self, meta_path: str, meta: dict):
+        tmp_path = f"{meta_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(meta, file)
+        os.replace(tmp_path, meta_path)
+
+    def _evict(self) -> List[str]:
+        """Drops the least recently used pages from the index until the cache fits in
+        max_bytes. Called with the lock held
+
+        Returns:
+            keys of the pages whose files must be deleted
+        """
+        if self.max_bytes is None or self._total_bytes <= self.max_bytes:
+            return []
+
+        evicted = []
+        for key, (size, _) in sorted(self._index.items(), key=lambda kv: kv[1][1]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            del self._index[key]
+            self._total_bytes -= size
+            evicted.append(key)
+        return evicted
+
+    def iter_recorded(self):
+        """Yields (url, html) of every page in the cache, e.g. to serve recorded pages"""
+        with self._lock:
+            keys = list(self._index)
+        for key in keys:
+            html_path, meta_path = self._paths(key)
+            try:
+                with open(meta_path, "r") as file:
+                    url = json.load(file)["url"]
+                with open(html_path, "rb") as file:
+                    yield url, gzip.decompress(file.read())
+            except (OSError, ValueError):
+                continue  # evicted meanwhile
+
+    def stats(self) -> dict:
+        """Number of pages served from the cache (fresh or revalidated) and fetched"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "revalidated": self.revalidated,
+                "misses": self.misses,
+                "pages": len(self._index),
+                "bytes": self._total_bytes,
+            }
@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List
+
+from core.review import Review
+
+
+class PageJournal:
+    """Append-only journal of the parsed pages of a scrape, one JSON line per page.
+
+    A scrape that dies half way can be re-run with the same job: the pages found in
+    the journal are not fetched again. Lines are flushed to the OS on every append but
+    fsync'ed in batches (every ``fsync_every`` pages or ``fsync_interval`` seconds), so
+    writing the journal does not slow down the parsing callbacks.
+
+    New reviews shift the reviews between pages, so a journal older than ``max_age``
+    is discarded instead of resumed.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fsync_every: int = 20,
+        fsync_interval: float = 2.0,
+        max_age: float = None,
+    ):
+        """
+        Args:
+            path: path of the journal file
+            fsync_every: number of appended pages after which the file is fsync'ed
+            fsync_interval: seconds after which the file is fsync'ed, whatever the number of pages
+            max_age: seconds after its creation during which the journal can be resumed. No limit when None
+        """
+        self.path = path
+        self._max_age = max_age
+        self._fsync_every = fsync_every
+        self._fsync_interval = fsync_interval
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+        # {"path", "position"} of the file the reviews are appended to, see load
+        self.output: dict = None
+
+    def load(self, plan: dict, output: dict = None) -> Dict[int, List[Review]]:
+        """Reads the pages journaled by a previous run of the same job.
+
+        Args:
+            plan: description of the pages to scrape (e.g. number of urls). When it does not
+                match the plan of the journal, or the journal is older than max_age, the
+                reviews have moved between pages and the journal is discarded
+            output: {"path", "position"} of the file the reviews are appended to, position
+                being its size before this job writes to it. When the previous run appended
+                to the same file, its position is kept in self.output: what the previous run
+                wrote after it is written again, from the journal or from scratch
+
+        Returns:
+            {idx: reviews} of the completed pages
+        """
+        pages = {}
+        created_at = time.time()
+        self.output = output
+        if os.path.exists(self.path):
+            with open(self.path, "r") as file:
+                header = None
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # torn write of the last line when the run died
+
+                    if header is None:
+                        header = record
+                        previous = header.get("output")
+                        if output is not None and previous is not None:
+                            if previous["path"] == output["path"]:
+                                self.output = previous
+                        if header.get("plan") != plan or self._is_expired(header):
+                            pages = {}
+                            break
+                        created_at = header["created_at"]
+                    else:
+                        # reviews are journaled as JSON lists of their fields
+                        pages[record["idx"]] = [
+                            Review.from_obj(r) for r in record["reviews"]
+                        ]
+
+        # compact the kept pages into a new journal, replacing the old one atomically
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        self._file = open(tmp_path, "w")
+        self._write({"plan": plan, "created_at": created_at, "output": self.output})
+        for idx, reviews in pages.items():
+            self._write({"idx": idx, "reviews": reviews})
+        self._sync()
+        self._file.close()
+        os.replace(tmp_path, self.path)
+
+        self._file = open(self.path, "a")
+        return pages
+
+    def _is_expired(self, header: dict) -> bool:
+        """Whether the journal with this header is too old to be resumed"""
+        if "created_at" not in header:  # journal of an older version, age unknown
+            return True
+        return (
+            self._max_age is not None
+            and time.time() - header["created_at"] > self._max_age
+        )
+
+    def _write(self, record: dict):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def append(self, page: dict):
+        """Journals a parsed page. Thread safe
+
+        Args:
+            page: {"idx", "reviews"}
+        """
+        with self._lock:
+            if self._file is None:  # closed, the scrape is over
+                return
+            self._write({"idx": page["idx"], "reviews": page["reviews"]})
+            self._unsynced += 1
+            if (
+                self._unsynced >= self._fsync_every
+                or time.monotonic() - self._last_sync >= self._fsync_interval
+            ):
+                self._sync()
+
+    def close(self):
+        """Syncs and closes the journal file, keeping it on disk"""
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    def remove(self):
+        """Closes and deletes the journal, once the scrape has been saved"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -1,6 +1,7 @@
-from typing import Literal, Optional
+from datetime import date
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel, Field, PositiveInt
+from pydantic import BaseModel, Field, PositiveInt, model_validator
 
 
 class StopCritera(BaseModel):
@@ -274,6 +275,25 @@ class Input(BaseModel):
 
     n_rows: Optional[int] = -1
     stop_critera: Optional[StopCritera] = None
+    incremental: Optional[bool] = False
+
+    # review filters applied by booking.com, only the matching reviews are paginated
+    language: Optional[str] = Field(None, pattern=r"^[a-z]{2}(-[a-z]{2})?$")
+    customer_type: Optional[
+        Literal["business", "couple", "family", "friends", "solo"]
+    ] = None
+    score: Optional[Literal["superb", "good", "passable", "poor", "very_poor"]] = None
+    time_of_year: Optional[Literal["mar_may", "jun_aug", "sep_nov", "dec_feb"]] = None
+
+    # date window of review_post_date (inclusive), only the pages inside it are fetched
+    since: Optional[date] = None
+    until: Optional[date] = None
+
+    @model_validator(mode="after")
+    def check_window(self) -> "Input":
+        if self.since and self.until and self.since > self.until:
+            raise ValueError(f"since {self.since} is after until {self.until}")
+        return self
 
 
 sort_by_map = {
@@ -284,12 +304,74 @@ sort_by_map = {
     "lowest_scores": "f_score_asc",
 }
 
+# query parameters of the review filters of Input
+customer_type_map = {
+    "business": "business_traveller",
+    "couple": "couple",
+    "family": "family_with_children",
+    "friends": "group_of_friends",
+    "solo": "solo_traveller",
+}
+
+# score bands of booking.com: superb 9+, good 7-9, passable 5-7, poor 3-5, very_poor 1-3
+score_map = {
+    "superb": "review_adj_superb",
+    "good": "review_adj_good",
+    "passable": "review_adj_average_passable",
+    "poor": "review_adj_poor",
+    "very_poor": "review_adj_very_poor",
+}
+
+time_of_year_map = {
+    "mar_may": "mar-may",
+    "jun_aug": "jun-aug",
+    "sep_nov": "sep-nov",
+    "dec_feb": "dec-feb",
+}
+
+
+class Watermark(BaseModel):
+    """Newest review seen by the previous incremental runs of a hotel"""
+
+    hotel_name: str
+    country: str
+    review_post_date: str  # "%m-%d-%Y %H:%M:%S" like the review_post_date field
+    fingerprints: List[str] = []  # fingerprints of the reviews posted on that date
+    # version of review_fingerprint of the fingerprints, 1 before it was stored
+    fingerprint_version: int = 1
+    updated_at: str
+
 
 class Config(BaseModel):
     REQUESTS_PER_SECOND: Optional[PositiveInt] = 10
     HOTEL_REVIEWS_PAGE: str
     MAX_RETIES: Optional[int] = 3
     OUTPUT_DIR: Optional[str] = None
+    HTTP_POOL_SIZE: Optional[PositiveInt] = 10
+    HTTP_KEEP_ALIVE: Optional[bool] = True
+    ENGINE: Optional[Literal["thread", "async"]] = "thread"
+    MAX_CONCURRENCY: Optional[PositiveInt] = 10
+    REQUEST_TIMEOUT: Optional[float] = 30
+    RATE_LIMIT_BURST: Optional[PositiveInt] = None
+    RATE_LIMIT_ADAPTIVE: Optional[bool] = True
+    PARSE_QUEUE_SIZE: Optional[PositiveInt] = 50
+    PARSE_POOL_SIZE: Optional[PositiveInt] = None
+    PARSER_BACKEND: Optional[Literal["lxml", "bs4"]] = "lxml"
+    PREFETCH_WINDOW: Optional[PositiveInt] = 5
+    BATCH_ACTIVE_HOTELS: Optional[PositiveInt] = 10
+    CHECKPOINT: Optional[bool] = True
+    CHECKPOINT_TTL: Optional[float] = 3600
+    OUTPUT_FORMAT: Literal["csv", "jsonl", "parquet", "sqlite"] = "csv"
+    PARQUET_ROW_GROUP_SIZE: Optional[PositiveInt] = 10000
+    PARQUET_COMPRESSION: Optional[str] = "zstd"
+    HTTP_CACHE: Optional[bool] = False
+    HTTP_CACHE_DIR: Optional[str] = None
+    HTTP_CACHE_TTL: Optional[float] = 86400
+    HTTP_CACHE_MAX_MB: Optional[PositiveInt] = 1024
+    HTTP_CACHE_MODE: Literal["cache", "record", "replay"] = "cache"
+    METRICS_FILE: Optional[str] = None
+    PAGE_SIZE: Optional[PositiveInt] = 10
+    SQLITE_PATH: Optional[str] = None
 
 
 if __name__ == "__main__":
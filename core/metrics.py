@@ -0,0 +1,255 @@
+import collections
+import threading
+import time
+from typing import Dict, Tuple
+
+# upper bounds (seconds) of the histogram buckets, the last bucket is +Inf
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+PARSE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+
+class Histogram:
+    """Distribution of observed values in fixed buckets, like a Prometheus histogram.
+    Not thread safe on its own, ScrapeMetrics holds the lock
+    """
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # per bucket, the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self) -> dict:
+        """{"buckets": {upper bound: cumulative count}, "sum", "count", "mean"}"""
+        cumulative, total = {}, 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            cumulative[bound] = total
+        return {
+            "buckets": cumulative,
+            "sum": self.sum,
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else 0.0,
+        }
+
+
+def wire_bytes(response) -> int:
+    """Bytes of the body of a requests/httpx response as received from the network, i.e.
+    still gzip/brotli compressed, unlike len(response.content)
+
+    Args:
+        response: requests or httpx response, once its content is read
+
+    Returns:
+        number of bytes, from the Content-Length header when the client does not count them
+    """
+    n_bytes = getattr(response, "num_bytes_downloaded", None)  # httpx
+    if n_bytes is None and getattr(response, "raw", None) is not None:
+        n_bytes = response.raw.tell()  # requests, bytes read from the socket by urllib3
+    if not n_bytes:
+        n_bytes = int(response.headers.get("Content-Length") or 0)
+    return n_bytes
+
+
+class ScrapeMetrics:
+    """Per stage metrics of a scrape: fetch (latency, retries, bytes), parse (time per
+    page, queue depth) and write (throughput). Thread safe, the stages update it from
+    their own threads.
+
+    snapshot() returns them as a dict, to_prometheus() in the Prometheus text format.
+    """
+
+    def __init__(self, labels: Dict[str, str] = None):
+        """
+        Args:
+            labels: labels added to every exported metric e.g. {"hotel": ..., "sort_by": ...}
+        """
+        self.labels = labels or {}
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._finished: float = None
+
+        self.request_latency = Histogram(LATENCY_BUCKETS)
+        self.requests_by_status: Dict[int, int] = collections.Counter()
+        self.retries_by_status: Dict[int, int] = collections.Counter()
+        self.bytes_downloaded = 0
+
+        self.parse_time = Histogram(PARSE_BUCKETS)
+        self.pages_parsed = 0
+        self.reviews_parsed = 0
+        self.queue_depth = 0  # pages downloaded and not parsed yet
+        self.queue_depth_max = 0
+
+        self.reviews_written = 0
+        self.write_seconds = 0.0
+
+    def request_done(self, status_code: int, seconds: float, n_bytes: int):
+        """Records a response received from the network
+
+        Args:
+            status_code: status code of the response
+            seconds: latency of the request
+            n_bytes: bytes received, as sent on the wire (see wire_bytes)
+        """
+        with self._lock:
+            self.request_latency.observe(seconds)
+            self.requests_by_status[status_code] += 1
+            self.bytes_downloaded += n_bytes
+
+    def retried(self, status_code: int):
+        """Records a request retried after a response with status_code"""
+        with self._lock:
+            self.retries_by_status[status_code] += 1
+
+    def queued(self, delta: int):
+        """Records pages entering (+1) or leaving (-1) the parsing queue"""
+        with self._lock:
+            self.queue_depth += delta
+            self.queue_depth_max = max(self.queue_depth_max, self.queue_depth)
+
+    def page_parsed(self, page: dict):
+        """Records a page returned by parser.parse_page"""
+        with self._lock:
+            self.parse_time.observe(page.get("parse_seconds", 0.0))
+            self.pages_parsed += 1
+            self.reviews_parsed += len(page["reviews"])
+
+    def written(self, n_reviews: int, seconds: float):
+        """Records reviews written to the output file"""
+        with self._lock:
+            self.reviews_written += n_reviews
+            self.write_seconds += seconds
+
+    def finish(self):
+        """Stops the clock of the reviews/sec rate"""
+        self._finished = time.monotonic()
+
+    def snapshot(self) -> dict:
+        """Returns the current value of every metric as a dict"""
+        with self._lock:
+            elapsed = (self._finished or time.monotonic()) - self._started
+            return {
+                "elapsed_seconds": elapsed,
+                "fetch": {
+                    "latency_seconds": self.request_latency.snapshot(),
+                    "requests_by_status": dict(self.requests_by_status),
+                    "retries_by_status": dict(self.retries_by_status),
+                    "bytes": self.bytes_downloaded,
+                },
+                "parse": {
+                    "page_seconds": self.parse_time.snapshot(),
+                    "pages": self.pages_parsed,
+                    "reviews": self.reviews_parsed,
+                    "reviews_per_sec": self.reviews_parsed / elapsed if elapsed else 0,
+                    "queue_depth": self.queue_depth,
+                    "queue_depth_max": self.queue_depth_max,
+                },
+                "write": {
+                    "reviews": self.reviews_written,
+                    "seconds": self.write_seconds,
+                    "reviews_per_sec": (
+                        self.reviews_written / self.write_seconds
+                        if self.write_seconds
+                        else 0
+                    ),
+                },
+            }
+
+    def to_prometheus(self) -> str:
+        """Returns the metrics in the Prometheus text exposition format"""
+        snap = self.snapshot()
+        lines = []
+
+        def labels(**extra) -> str:
+            items = {**self.labels, **{k: str(v) for k, v in extra.items()}}
+            if not items:
+                return ""
+            inner = ",".join(f'{k}="{v}"' for k, v in items.items())
+            return "{" + inner + "}"
+
+        def histogram(name: str, help_text: str, hist: dict):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for bound, count in hist["buckets"].items():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{labels(le=le)} {count}")
+            lines.append(f"{name}_sum{labels()} {hist['sum']}")
+            lines.append(f"{name}_count{labels()} {hist['count']}")
+
+        def metric(name: str, kind: str, help_text: str, values: dict):
+            """values: {label dict as tuple of pairs: value}"""
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for extra, value in values.items():
+                lines.append(f"{name}{labels(**dict(extra))} {value}")
+
+        fetch, parse, write = snap["fetch"], snap["parse"], snap["write"]
+        histogram(
+            "booking_request_latency_seconds",
+            "Latency of the review page requests",
+            fetch["latency_seconds"],
+        )
+        metric(
+            "booking_requests_total",
+            "counter",
+            "Responses received, by status code",
+            {(("status", s),): n for s, n in fetch["requests_by_status"].items()},
+        )
+        metric(
+            "booking_retries_total",
+            "counter",
+            "Requests retried, by status code of the failed response",
+            {(("status", s),): n for s, n in fetch["retries_by_status"].items()},
+        )
+        metric(
+            "booking_downloaded_bytes_total",
+            "counter",
+            "Bytes of the downloaded pages, as received (compressed)",
+            {(): fetch["bytes"]},
+        )
+        histogram(
+            "booking_parse_page_seconds",
+            "Time to parse one review page",
+            parse["page_seconds"],
+        )
+        metric(
+            "booking_parsed_reviews_total",
+            "counter",
+            "Reviews parsed",
+            {(): parse["reviews"]},
+        )
+        metric(
+            "booking_parse_queue_depth",
+            "gauge",
+            "Pages downloaded and waiting to be parsed",
+            {(): parse["queue_depth"]},
+        )
+        metric(
+            "booking_reviews_per_second",
+            "gauge",
+            "Reviews parsed per second since the start of the scrape",
+            {(): parse["reviews_per_sec"]},
+        )
+        metric(
+            "booking_written_reviews_total",
+            "counter",
+            "Reviews written to the output file",
+            {(): write["reviews"]},
+        )
+        metric(
+            "booking_write_seconds_total",
+            "counter",
+            "Time spent writing the output file",
+            {(): write["seconds"]},
+        )
+        return "\n".join(lines) + "\n"
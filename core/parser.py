@@ -0,0 +1,370 @@
+import functools
+import re
+import string
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from bs4 import BeautifulSoup, SoupStrainer
+from core.review import Review, intern_reviews
+from dateutil import parser
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+except ImportError:  # the bs4 backend is used when lxml is not installed
+    etree, lxml_html = None, None
+
+
+# only the review list is built, the rest of the document is skipped by the html parser
+_REVIEW_LIST_STRAINER = SoupStrainer("ul", class_="review_list")
+# start of the review list, everything before it (head, scripts, header) is not parsed by lxml
+_RE_REVIEW_LIST_START = re.compile(
+    rb"<ul\b[^>]*\bclass=[\"']([^\"']*\s)?review_list[\s\"']", re.IGNORECASE
+)
+
+
+def _validate(element):
+    """
+    Removes multitples spaces and strips \n
+
+    Args:
+        element: Beautiful Soap element
+
+    Returns:
+        string text extracted from element
+    """
+    if element is not None:
+        if isinstance(element, str):
+            text = re.sub(r"\s+", " ", element).strip(" \n")
+        else:
+            text = re.sub(r"\s+", " ", element.text).strip(" \n")
+        if len(text):
+            return text
+
+    return None
+
+
+# formats of the "Reviewed: 12 March 2024" dates shown on the en-gb review pages
+_REVIEW_DATE_FORMATS = ("%d %B %Y", "%B %d, %Y", "%d %b %Y", "%b %d, %Y")
+
+
+@functools.lru_cache(maxsize=4096)
+def normalize_review_date(date: str) -> str:
+    """Converts the review date of the page to "%m-%d-%Y %H:%M:%S".
+
+    A hotel has a few hundred distinct dates across thousands of reviews, so the
+    results are memoized. The known booking.com formats are tried with strptime
+    before falling back to the (much slower) generic dateutil parser.
+
+    Args:
+        date: date text of the page e.g. '12 March 2024'
+
+    Returns:
+        formatted date string
+    """
+    for fmt in _REVIEW_DATE_FORMATS:
+        try:
+            return datetime.strptime(date, fmt).strftime("%m-%d-%Y %H:%M:%S")
+        except ValueError:
+            continue
+
+    return parser.parse(date).strftime("%m-%d-%Y %H:%M:%S")
+
+
+def _count_people(text: str) -> int:
+    """Returns the number from texts like '3 people found this review helpful'"""
+    if text is None:
+        return 0
+    return int(
+        text.split("people")[0].strip()
+        if "people" in text
+        else text.split("person")[0].strip()
+    )
+
+
+def _with_period(text: str) -> str:
+    """Add '.' period sign to the end of the text. If its not already there"""
+    return f"{text}." if text and text[-1] not in string.punctuation else text
+
+
+def _build_review(
+    username: str,
+    user_country: str,
+    room_view: str,
+    stay_duration: str,
+    stay_type: str,
+    date: str,
+    review_title: str,
+    rating: str,
+    review_texts: List[str],
+    original_lang: str,
+    found_helpful: str,
+    found_unhelpful: str,
+    owner_response: str,
+) -> Review:
+    """Builds the review from the texts extracted by a parser backend.
+    Every backend goes through here, so they all produce the exact same fields.
+
+    All the arguments are the validated texts of the corresponding elements (None when
+    the element is missing), except:
+
+    Args:
+        review_texts: texts of the first (up to 3) review body elements
+        original_lang: lang attribute of the first review body element
+
+    Returns:
+        Review
+    """
+    stay_duration = stay_duration.split(" ·")[0] if stay_duration is not None else None
+
+    if date:
+        date = normalize_review_date(date.split(":")[-1].strip())
+
+    rating = float(rating) if rating is not None else rating
+
+    review_text_liked = None
+    review_text_disliked = None
+    full_review, en_full_review = None, None
+    if review_texts:
+        review_text_liked = review_texts[0]
+        if (
+            "There are no comments available for this review".lower()
+            in review_text_liked.lower()
+        ):
+            review_text_liked = None
+
+        if len(review_texts) > 1:
+            review_text_disliked = review_texts[1]
+            if review_text_disliked is None:
+                if len(review_texts) > 2:
+                    review_text_disliked = review_texts[2]
+
+    t_title = _with_period(f"title: {review_title}" if review_title else "")
+    t_liked = _with_period(f"liked: {review_text_liked}" if review_text_liked else "")
+    t_disliked = _with_period(
+        f"disliked: {review_text_disliked}" if review_text_disliked else ""
+    )
+
+    full_review = f"{t_title} {t_liked} {t_disliked}"
+    full_review = _validate(full_review)
+    # ------------------------------------------------
+
+    if "en" in original_lang:
+        en_full_review = full_review
+
+    return Review(
+        username=username,
+        user_country=user_country,
+        room_view=room_view,
+        stay_duration=stay_duration,
+        stay_type=stay_type,
+        review_post_date=date,
+        review_title=review_title,
+        rating=rating,
+        original_lang=original_lang,
+        review_text_liked=review_text_liked,
+        review_text_disliked=review_text_disliked,
+        full_review=full_review,
+        en_full_review=en_full_review,
+        found_helpful=_count_people(found_helpful),
+        found_unhelpful=_count_people(found_unhelpful),
+        owner_resp_text=owner_response,
+    )
+
+
+##########################################################
+# ******** BeautifulSoup backend ********
+##########################################################
+
+
+def _parse_reviews_bs4(content: bytes) -> List[Review]:
+    """Parses the reviews of a page with BeautifulSoup and the pure python html.parser"""
+    page_reviews = []
+    soup = BeautifulSoup(
+        content.decode(), "html.parser", parse_only=_REVIEW_LIST_STRAINER
+    )
+    reviews = soup.select("ul.review_list > li")
+
+    for review in reviews:  # iterate on the review items of the current page
+        # Use a lambda function to find the element with inner text containing "Received"
+        date = review.find(
+            lambda tag: tag.name == "span" and "Reviewed:" in tag.get_text()
+        )
+        review_text = review.select("div.c-review span.c-review__body")
+        owner_response = review.select(
+            "div.c-review-block__response span.c-review-block__response__body"
+        )
+
+        res = _build_review(
+            username=_validate(
+                review.select_one(
+                    "div.c-review-block__guest span.bui-avatar-block__title"
+                )
+            ),
+            user_country=_validate(
+                review.select_one(
+                    "div.c-review-block__guest span.bui-avatar-block__subtitle"
+                )
+            ),
+            room_view=_validate(
+                review.select_one(
+                    "div.c-review-block__room-info-row div.bui-list__body"
+                )
+            ),
+            stay_duration=_validate(
+                review.select_one("ul.c-review-block__stay-date div.bui-list__body")
+            ),
+            stay_type=_validate(
+                review.select_one(
+                    "ul.review-panel-wide__traveller_type div.bui-list__body"
+                )
+            ),
+            date=_validate(date),
+            review_title=_validate(review.select_one("h3.c-review-block__title")),
+            rating=_validate(review.select_one("div.bui-review-score__badge")),
+            review_texts=[_validate(e) for e in review_text[:3]],
+            original_lang=(
+                review_text[0].get("lang", default=None) if review_text else None
+            ),
+            found_helpful=_validate(
+                review.select_one(
+                    "div.c-review-block__row--helpful-vote p.review-helpful__vote-others-helpful"
+                )
+            ),
+            found_unhelpful=_validate(
+                review.select_one("div.c-review-block__row--helpful-vote p.--unhelpful")
+            ),
+            owner_response=_validate(owner_response[-1]) if owner_response else None,
+        )
+        page_reviews.append(res)
+
+    return page_reviews
+
+
+##########################################################
+# ******** lxml backend ********
+##########################################################
+
+
+def _cls(name: str) -> str:
+    """XPath predicate matching elements having the css class 'name'"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+if etree is not None:
+    # compiled once per process, the same css selectors as the bs4 backend
+    _X_REVIEWS = etree.XPath(f"//ul[{_cls('review_list')}]/li")
+    _X_USERNAME = etree.XPath(
+        f".//div[{_cls('c-review-block__guest')}]//span[{_cls('bui-avatar-block__title')}]"
+    )
+    _X_USER_COUNTRY = etree.XPath(
+        f".//div[{_cls('c-review-block__guest')}]//span[{_cls('bui-avatar-block__subtitle')}]"
+    )
+    _X_ROOM_VIEW = etree.XPath(
+        f".//div[{_cls('c-review-block__room-info-row')}]//div[{_cls('bui-list__body')}]"
+    )
+    _X_STAY_DURATION = etree.XPath(
+        f".//ul[{_cls('c-review-block__stay-date')}]//div[{_cls('bui-list__body')}]"
+    )
+    _X_STAY_TYPE = etree.XPath(
+        f".//ul[{_cls('review-panel-wide__traveller_type')}]//div[{_cls('bui-list__body')}]"
+    )
+    _X_TITLE = etree.XPath(f".//h3[{_cls('c-review-block__title')}]")
+    _X_DATE = etree.XPath(".//span[contains(., 'Reviewed:')]")
+    _X_RATING = etree.XPath(f".//div[{_cls('bui-review-score__badge')}]")
+    _X_REVIEW_TEXT = etree.XPath(
+        f".//div[{_cls('c-review')}]//span[{_cls('c-review__body')}]"
+    )
+    _X_HELPFUL = etree.XPath(
+        f".//div[{_cls('c-review-block__row--helpful-vote')}]//p[{_cls('review-helpful__vote-others-helpful')}]"
+    )
+    _X_UNHELPFUL = etree.XPath(
+        f".//div[{_cls('c-review-block__row--helpful-vote')}]//p[{_cls('--unhelpful')}]"
+    )
+    _X_OWNER_RESPONSE = etree.XPath(
+        f".//div[{_cls('c-review-block__response')}]//span[{_cls('c-review-block__response__body')}]"
+    )
+    _LXML_PARSER = lxml_html.HTMLParser(encoding="utf-8")
+
+
+def _first_text(xpath: "etree.XPath", element) -> str:
+    """Validated text of the first element matched by xpath, None when nothing matches"""
+    found = xpath(element)
+    return _validate(found[0].text_content()) if found else None
+
+
+def _parse_reviews_lxml(content: bytes) -> List[Review]:
+    """Parses the reviews of a page with lxml and precompiled XPath expressions"""
+    page_reviews = []
+    match = _RE_REVIEW_LIST_START.search(content)
+    if match is None:  # no reviews on the page
+        return page_reviews
+
+    root = lxml_html.fromstring(content[match.start() :], parser=_LXML_PARSER)
+
+    for review in _X_REVIEWS(root):  # iterate on the review items of the current page
+        review_text = _X_REVIEW_TEXT(review)
+        owner_response = _X_OWNER_RESPONSE(review)
+
+        res = _build_review(
+            username=_first_text(_X_USERNAME, review),
+            user_country=_first_text(_X_USER_COUNTRY, review),
+            room_view=_first_text(_X_ROOM_VIEW, review),
+            stay_duration=_first_text(_X_STAY_DURATION, review),
+            stay_type=_first_text(_X_STAY_TYPE, review),
+            date=_first_text(_X_DATE, review),
+            review_title=_first_text(_X_TITLE, review),
+            rating=_first_text(_X_RATING, review),
+            review_texts=[_validate(e.text_content()) for e in review_text[:3]],
+            original_lang=review_text[0].get("lang") if review_text else None,
+            found_helpful=_first_text(_X_HELPFUL, review),
+            found_unhelpful=_first_text(_X_UNHELPFUL, review),
+            owner_response=(
+                _validate(owner_response[-1].text_content()) if owner_response else None
+            ),
+        )
+        page_reviews.append(res)
+
+    return page_reviews
+
+
+PARSER_BACKENDS: Dict[str, Callable[[bytes], List[Review]]] = {
+    "bs4": _parse_reviews_bs4,
+    "lxml": _parse_reviews_lxml,
+}
+
+
+def resolve_backend(backend: str) -> str:
+    """Returns the backend to use, falling back to 'bs4' when lxml is not installed"""
+    if backend == "lxml" and etree is None:
+        return "bs4"
+    return backend
+
+
+def parse_page(idx: int, content: bytes, backend: str = "bs4") -> dict:
+    """Parses the html content of a single reviews page.
+
+    It is a module level function, so that the parsing processes only receive
+    the page idx and its html instead of the Scrape object and the response.
+
+    Args:
+        idx: orginal offset_param value / id of reviews page
+        content: html of the reviews page
+        backend: 'lxml' or 'bs4', see PARSER_BACKENDS
+
+    Returns:
+        {idx of the review page, list of reviews in that page, parsing time in seconds}
+    """
+    _start = time.perf_counter()
+    # interned, the page is pickled with one copy of each categorical string
+    page_reviews = intern_reviews(PARSER_BACKENDS[resolve_backend(backend)](content))
+
+    # idx: orginal offset_param value / id of reviews page
+    # reviews: list of reviews found on the page
+    # parse_seconds: measured in the parsing process, without the time spent queued
+    return {
+        "idx": idx,
+        "reviews": page_reviews,
+        "parse_seconds": time.perf_counter() - _start,
+    }
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread safe token bucket shared by every request of the fetch path.
+
+    Tokens are added at ``rate`` per second up to ``burst``, and every request takes one.
+    When ``adaptive`` is set, the rate is halved each time the server answers 429/5xx and
+    is slowly increased back to the configured rate on successful responses (AIMD).
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = None,
+        adaptive: bool = True,
+        min_rate: float = None,
+    ):
+        """
+        Args:
+            rate: maximum number of requests per second
+            burst: number of requests that can be sent at once after an idle period. Defaults to rate
+            adaptive: whether to slow down on 429/5xx responses
+            min_rate: lowest rate the adaptive mode can go down to. Defaults to rate / 10
+        """
+        self._max_rate = float(rate)
+        self._rate = float(rate)
+        self._min_rate = float(min_rate) if min_rate else max(rate / 10, 0.1)
+        self._burst = float(burst) if burst else float(rate)
+        self._adaptive = adaptive
+
+        self._tokens = self._burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        """Current rate in requests per second"""
+        return self._rate
+
+    def _reserve(self) -> float:
+        """Takes one token and returns how many seconds the caller has to wait for it.
+        The bucket can go negative, so waiting callers are served in order.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self._burst, self._tokens + (now - self._last) * self._rate
+            )
+            self._last = now
+            self._tokens -= 1
+
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self._rate
+
+    def acquire(self):
+        """Blocks the calling thread until a request can be sent"""
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Waits without blocking the event loop until a request can be sent"""
+        wait = self._reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+    def feedback(self, status_code: int):
+        """Adjusts the rate based on the status code of a response
+
+        Args:
+            status_code: http status code of the response
+        """
+        if not self._adaptive:
+            return
+
+        with self._lock:
+            if status_code == 429 or status_code >= 500:
+                self._rate = max(self._min_rate, self._rate / 2)
+                # drop the saved up burst, so the next requests are spaced out
+                self._tokens = min(self._tokens, 0)
+            elif self._rate < self._max_rate:
+                self._rate = min(self._max_rate, self._rate + self._max_rate / 50)
@@ -0,0 +1,90 @@
+import sys
+from typing import List, NamedTuple, Optional
+
+# low cardinality fields, interned so that the reviews of a hotel share their strings
+CATEGORICAL_FIELDS = (
+    "user_country",
+    "room_view",
+    "stay_duration",
+    "stay_type",
+    "review_post_date",
+    "original_lang",
+)
+
+
+class Review(NamedTuple):
+    """Review as built by the parser, a tuple instead of a dict: it takes about a quarter
+    of the memory of the 16 keys dict, and is pickled as a plain tuple of values when it
+    comes back from the parsing processes.
+
+    It can still be read like a dict (review["rating"], review.get("rating")): only its
+    fields are keys, review["count"] raises KeyError like a dict would. It is
+    converted to a dict with to_dict() where reviews leave the scraper (run() results,
+    iter_reviews, JSON outputs).
+    """
+
+    username: Optional[str]
+    user_country: Optional[str]
+    room_view: Optional[str]
+    stay_duration: Optional[str]
+    stay_type: Optional[str]
+    review_post_date: Optional[str]
+    review_title: Optional[str]
+    rating: Optional[float]
+    original_lang: Optional[str]
+    review_text_liked: Optional[str]
+    review_text_disliked: Optional[str]
+    full_review: Optional[str]
+    en_full_review: Optional[str]
+    found_helpful: int
+    found_unhelpful: int
+    owner_resp_text: Optional[str]
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            # not getattr: tuple methods (count, index) are not fields
+            return tuple.__getitem__(self, _FIELD_IDXS[key])
+        return tuple.__getitem__(self, key)
+
+    def get(self, key: str, default=None):
+        idx = _FIELD_IDXS.get(key)
+        return default if idx is None else tuple.__getitem__(self, idx)
+
+    def to_dict(self) -> dict:
+        return dict(zip(self._fields, self))
+
+    @classmethod
+    def from_obj(cls, obj) -> "Review":
+        """Review from its dict or list form, e.g. read back from a JSON journal"""
+        return cls(**obj) if isinstance(obj, dict) else cls(*obj)
+
+
+_FIELD_IDXS = {field: i for i, field in enumerate(Review._fields)}
+_CATEGORICAL_IDXS = [_FIELD_IDXS[f] for f in CATEGORICAL_FIELDS]
+
+
+def intern_reviews(reviews: List[Review]) -> List[Review]:
+    """Interns the categorical fields of reviews, so that equal values are one string.
+
+    Strings are not interned across processes: a page pickled by a parsing process
+    comes back with its own copies, so the pages are interned again once received.
+
+    Args:
+        reviews: list of reviews
+
+    Returns:
+        the reviews with interned categorical fields
+    """
+    interned = []
+    for review in reviews:
+        values = list(review)
+        for i in _CATEGORICAL_IDXS:
+            if values[i] is not None:
+                values[i] = sys.intern(values[i])
+        interned.append(Review._make(values))
+    return interned
+
+
+def to_dicts(reviews: List[Review]) -> List[dict]:
+    """Converts reviews to dicts, for the public API"""
+    return [r.to_dict() for r in reviews]
@@ -1,32 +1,77 @@
+import asyncio
+import collections
 import concurrent.futures
-import csv
+import contextlib
+import itertools
 import logging
-import multiprocessing as mp
 import os
-import re
-import string
 import sys
 import threading
 import time
 from datetime import datetime
-from typing import List, Union
+from typing import Callable, Dict, Iterator, List, Tuple
 from urllib.parse import parse_qs, urlparse
 
-import numpy as np
 import requests
 import yaml
-from bs4 import BeautifulSoup
-from dateutil import parser
+from bs4 import BeautifulSoup, SoupStrainer
+
+from core.async_fetch import AsyncFetcher
+from core.cache import ResponseCache
+from core.checkpoint import PageJournal
+from core.data_models import (
+    Config,
+    Input,
+    customer_type_map,
+    score_map,
+    sort_by_map,
+    time_of_year_map,
+)
+from core.metrics import ScrapeMetrics, wire_bytes
+from core.parser import parse_page, resolve_backend
+from core.rate_limiter import TokenBucket
+from core.review import Review, intern_reviews, to_dicts
+from core.session import SessionPool
+from core.sinks import SINKS, PageReorderer, ParquetSink, ReviewSink
+from core.store import SqliteSink
+from core.watermark import (
+    DATE_FORMAT,
+    advance_watermark,
+    is_seen,
+    load_watermark,
+    save_watermark,
+)
+from core.workers import get_parse_pool
 
-from core.data_models import Config, Input, sort_by_map
-
-PROCESS_POOL_SIZE = 5
 safari_user_agent = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15"
 headers = {"User-Agent": safari_user_agent}
 
 
 class Scrape:
-    def __init__(self, input: dict, save_data_to_disk=True, logger=None) -> None:
+    def __init__(
+        self,
+        input: dict,
+        save_data_to_disk=True,
+        logger=None,
+        config: Config = None,
+        sessions: SessionPool = None,
+        rate_limiter: TokenBucket = None,
+        stream: bool = False,
+        cache: ResponseCache = None,
+    ) -> None:
+        """
+        Args:
+            input: input params, see data_models.Input
+            save_data_to_disk: whether to save the reviews to OUTPUT_DIR
+            logger: logger to use instead of the default console and file logger
+            config: already loaded config. config.yml is loaded when None
+            sessions: session pool shared with other Scrape objects (e.g. in batch mode)
+            rate_limiter: rate limiter shared with other Scrape objects (e.g. in batch mode)
+            stream: write the reviews to OUTPUT_DIR page by page while scraping, instead of
+                keeping them in memory. run() then returns an empty list
+            cache: response cache shared with other Scrape objects (e.g. in batch mode).
+                Created from config when None and HTTP_CACHE is set
+        """
         if "job_id" not in os.environ:
             os.environ["job_id"] = str(datetime.now().strftime("%Y_%m_%d_%H_%M_%S"))
 
@@ -36,16 +81,51 @@ class Scrape:
             self._get_logger()
             self.logger = logging.getLogger()
 
-        self._config = self._load_config()
+        self._config = config if config is not None else self._load_config()
         self.input_params = Input(**input)
 
-        # the below property is for the purpose of monitoring progress
-        # It contains the parsed reviews of processed pages and their idx
-        self._parsed_pages_reviews = (
-            mp.Manager().list()
-        )  # It will contians the list of reviews for each page
+        if (
+            self.input_params.incremental
+            and self.input_params.sort_by != "newest_first"
+        ):
+            self.logger.warning("Incremental mode always sorts by 'newest_first'")
+            self.input_params.sort_by = "newest_first"
+
+        if self._has_window() and self.input_params.sort_by not in (
+            "newest_first",
+            "oldest_first",
+        ):
+            self.logger.warning("A date window is always sorted by 'newest_first'")
+            self.input_params.sort_by = "newest_first"
+
+        self._parser_backend = resolve_backend(self._config.PARSER_BACKEND)
+        if self._parser_backend != self._config.PARSER_BACKEND:
+            self.logger.warning(
+                f"lxml is not installed, using '{self._parser_backend}' parser backend"
+            )
+
+        # keep-alive sessions shared by all the fetch threads (one session per thread)
+        self._owns_sessions = sessions is None
+        self._sessions = sessions or self.create_session_pool(self._config)
+        # every request of this instance (full and conditional mode) takes a token from here
+        self._rate_limiter = rate_limiter or self.create_rate_limiter(self._config)
+        # pages served from disk skip the rate limiter, None when HTTP_CACHE is off
+        self._cache = cache or self.create_response_cache(self._config)
+        # per stage metrics of this scrape, see metrics()
+        self._metrics = ScrapeMetrics(
+            labels={
+                "hotel": self.input_params.hotel_name,
+                "country": self.input_params.country,
+                "sort_by": self.input_params.sort_by,
+            }
+        )
+
+        # the below properties are for the purpose of monitoring progress
+        # parsed pages come back to this process, so a plain counter is enough
+        self._pages_parsed = 0  # number of review pages parsed so far
+        self._progress_lock = threading.Lock()
         self._execution_finished = (
-            mp.Event()
+            threading.Event()
         )  # set this event when execution if finished
 
         st_ = ""
@@ -60,7 +140,73 @@ class Scrape:
         )
         self._save_data_to_disk = save_data_to_disk
 
-    def _get_logger(self):
+        self._stream = stream
+        if stream and not save_data_to_disk:
+            self.logger.warning("Nothing to stream to when save_data_to_disk is False")
+            self._stream = False
+        self.n_reviews_found = 0  # number of reviews found by run()
+
+        self._journal: PageJournal = None
+        self._sink: ReviewSink = None  # output file when streaming, see _open_output
+        self._output_position: int = None
+
+        # reviews per page honored by booking.com, PAGE_SIZE until the discovery page says otherwise
+        self._rows = self._config.PAGE_SIZE
+        # {url: response} of the review pages already downloaded while planning (the discovery
+        # page, the pages probed for a date window), see _take_prefetched
+        self._prefetched: Dict[str, object] = {}
+        self._prefetched_lock = threading.Lock()
+
+        self._watermark = None
+        if self.input_params.incremental:
+            # one directory per (hotel, country) that every incremental run appends to
+            # filtered runs have their own reviews file and watermark
+            self._LOCAL_OUTPUT_PATH = (
+                "{output_dir}/{entity_name}_"
+                + self.input_params.country
+                + self._filters_suffix()
+            )
+            self._watermark = load_watermark(self._watermark_path())
+            self.logger.info(
+                f"Watermark: {self._watermark.review_post_date if self._watermark else None}"
+            )
+
+    @staticmethod
+    def create_session_pool(config: Config) -> SessionPool:
+        """Returns a new session pool set up from config"""
+        return SessionPool(
+            headers,
+            pool_size=config.HTTP_POOL_SIZE,
+            keep_alive=config.HTTP_KEEP_ALIVE,
+        )
+
+    @staticmethod
+    def create_rate_limiter(config: Config) -> TokenBucket:
+        """Returns a new rate limiter set up from config"""
+        return TokenBucket(
+            config.REQUESTS_PER_SECOND,
+            burst=config.RATE_LIMIT_BURST,
+            adaptive=config.RATE_LIMIT_ADAPTIVE,
+        )
+
+    @staticmethod
+    def create_response_cache(config: Config) -> ResponseCache:
+        """Returns the response cache set up from config, None when HTTP_CACHE is off"""
+        if not config.HTTP_CACHE:
+            return None
+        return ResponseCache(
+            config.HTTP_CACHE_DIR or f"{config.OUTPUT_DIR}/.http_cache",
+            ttl=config.HTTP_CACHE_TTL,
+            max_bytes=(
+                config.HTTP_CACHE_MAX_MB * 1024 * 1024
+                if config.HTTP_CACHE_MAX_MB
+                else None
+            ),
+            mode=config.HTTP_CACHE_MODE,
+        )
+
+    @staticmethod
+    def _get_logger():
         if not os.path.isdir("logs"):
             os.mkdir("logs")
 
@@ -94,58 +240,193 @@ class Scrape:
         """
         self.logger.info("Progress Monitoring Thread Started")
         prev = 0
-        while not self._execution_finished.is_set():
-            time.sleep(2)
-            if len(self._parsed_pages_reviews):
-                ln = len(self._parsed_pages_reviews)
-                if ln > prev:
-                    self.logger.info(f"Processed {ln}/{len(ls_urls)}")
-                    prev = ln
+        while not self._execution_finished.wait(2):
+            ln = self._pages_parsed
+            if ln > prev:
+                self.logger.info(f"Processed {ln}/{len(ls_urls)}")
+                prev = ln
+            self._write_metrics_file()
+
+    def _count_parsed_page(self):
+        """Increments the number of parsed pages shown by the progress thread"""
+        with self._progress_lock:
+            self._pages_parsed += 1
+
+    def _create_sink(self) -> ReviewSink:
+        """Output file of the reviews, in OUTPUT_FORMAT. It is created in a direcotry based
+        on "entity_name" e.g. reviews_newest_first.csv
+
+        Parquet files can not be appended to, so they are partitioned instead: every run
+        adds a file to the dataset at OUTPUT_DIR/reviews_parquet, under
+        hotel=<hotel_name>/job_id=<job_id>/
+
+        SQLite upserts into a single database shared by every run, SQLITE_PATH
+        """
+        sort_by = self.input_params.sort_by
+        if self._config.OUTPUT_FORMAT == "parquet":
+            return ParquetSink(
+                f"{self._config.OUTPUT_DIR}/reviews_parquet/hotel={self.input_params.hotel_name}"
+                f"/job_id={os.getenv('job_id')}/reviews_{sort_by}.parquet",
+                row_group_size=self._config.PARQUET_ROW_GROUP_SIZE,
+                compression=self._config.PARQUET_COMPRESSION,
+            )
+
+        if self._config.OUTPUT_FORMAT == "sqlite":
+            return SqliteSink(
+                self._config.SQLITE_PATH or f"{self._config.OUTPUT_DIR}/reviews.sqlite",
+                hotel_name=self.input_params.hotel_name,
+                country=self.input_params.country,
+            )
+
+        dir_path = self._LOCAL_OUTPUT_PATH.format(
+            output_dir=self._config.OUTPUT_DIR, entity_name=self.input_params.hotel_name
+        )
+        sink_cls = SINKS[self._config.OUTPUT_FORMAT]
+        return sink_cls(f"{dir_path}/reviews_{sort_by}.{sink_cls.extension}")
 
     def _save_local_files(
         self,
-        ls_reviews: List[dict] = None,
+        ls_reviews: List[Review] = None,
     ):
-        """save local csv files. It creates a direcotry based on "entity_name" and stores
-        two csv files in it.
+        """save local files. It creates a direcotry based on "entity_name" and stores
+        the reviews file in it.
 
-        - reviews.csv: contains reviews
+        - reviews_<sort_by>.csv (or .jsonl, see OUTPUT_FORMAT): contains reviews
 
         Args:
             ls_reviews: list of review objects
 
         """
-        dir_path = self._LOCAL_OUTPUT_PATH.format(
-            output_dir=self._config.OUTPUT_DIR, entity_name=self.input_params.hotel_name
+        sink = self._create_sink()
+        _start = time.perf_counter()
+        try:
+            sink.write(ls_reviews)
+        except Exception as ex:
+            self.logger.error(ex)
+        finally:
+            sink.close()
+        self._metrics.written(sink.n_reviews, time.perf_counter() - _start)
+
+    def _log_connection_stats(self):
+        """Logs how many requests were served over an already open connection"""
+        stats = self._sessions.stats()
+        self.logger.info(
+            f"Connections opened: {stats['connections']}, requests: {stats['requests']}, reused: {stats['reused']}"
+        )
+        if self._cache is not None:
+            stats = self._cache.stats()
+            self.logger.info(
+                f"Cache hits: {stats['hits']}, revalidated: {stats['revalidated']}, misses: {stats['misses']}, "
+                f"size: {stats['bytes'] / 1024 / 1024:.1f} MB in {stats['pages']} pages"
+            )
+
+    def metrics(self) -> dict:
+        """Snapshot of the per stage metrics of the scrape: request latency histogram,
+        responses and retries by status code, bytes downloaded, parse time per page,
+        parsing queue depth, reviews/sec and writer throughput. It can be called while
+        the scrape runs e.g. from another thread
+
+        Returns:
+            {"elapsed_seconds", "fetch": {}, "parse": {}, "write": {}}, see ScrapeMetrics.snapshot
+        """
+        return self._metrics.snapshot()
+
+    def _write_metrics_file(self):
+        """Writes the metrics in the Prometheus text format to METRICS_FILE, e.g. for the
+        textfile collector of node_exporter. The file is replaced atomically
+        """
+        if not self._config.METRICS_FILE:
+            return
+
+        path = self._config.METRICS_FILE.format(
+            hotel_name=self.input_params.hotel_name,
+            country=self.input_params.country,
+            sort_by=self.input_params.sort_by,
+            job_id=os.getenv("job_id"),
         )
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as file:
+                file.write(self._metrics.to_prometheus())
+            os.replace(tmp_path, path)
+        except OSError as ex:
+            self.logger.error(f"Could not write the metrics file: {ex}")
+
+    def _log_metrics(self):
+        """Logs a summary of the metrics of the scrape"""
+        snap = self._metrics.snapshot()
+        fetch, parse, write = snap["fetch"], snap["parse"], snap["write"]
+        self.logger.info(
+            f"Requests: {fetch['latency_seconds']['count']} (mean {fetch['latency_seconds']['mean']:.3f}s), "
+            f"retries: {sum(fetch['retries_by_status'].values())}, downloaded: {fetch['bytes'] / 1024 / 1024:.1f} MB"
+        )
+        self.logger.info(
+            f"Parsed: {parse['pages']} pages (mean {parse['page_seconds']['mean']:.3f}s), "
+            f"{parse['reviews_per_sec']:.1f} reviews/sec, max queue depth: {parse['queue_depth_max']}"
+        )
+        if write["reviews"]:
+            self.logger.info(
+                f"Written: {write['reviews']} reviews, {write['reviews_per_sec']:.0f} reviews/sec"
+            )
 
-        if not os.path.exists(dir_path) and (ls_reviews):
-            os.makedirs(dir_path)
+    def _open_journal(self, ls_urls: List[dict]) -> Dict[int, List[Review]]:
+        """Opens the checkpoint journal of this job (hotel, country, sort_by)
 
-        fname = f"{dir_path}/reviews_{self.input_params.sort_by}.csv"
+        Args:
+            ls_urls: list containing url and idx/offset_param of each reviews page
 
-        if ls_reviews:
-            write_header = True
-            if os.path.exists(fname):
-                write_header = False
+        Returns:
+            {idx: reviews} of the pages completed by a previous run that died
+        """
+        p = self.input_params
+        self._journal = PageJournal(
+            f"{self._config.OUTPUT_DIR}/.checkpoints/{p.hotel_name}_{p.country}_{p.sort_by}{self._filters_suffix()}.jsonl",
+            max_age=self._config.CHECKPOINT_TTL,
+        )
+        # when the pages changed since the previous run (or may have, when its journal
+        # is older than CHECKPOINT_TTL), its journal is discarded
+        plan = {
+            "n_urls": len(ls_urls),
+            "first_url": ls_urls[0]["url"] if ls_urls else None,
+            "last_idx": ls_urls[-1]["idx"] if ls_urls else None,
+        }
 
-            with open(fname, "a", newline="") as file:
-                try:
-                    writer = csv.writer(file)
-                    if write_header:
-                        writer.writerow(ls_reviews[0].keys())
-                    for row in ls_reviews:
-                        writer.writerow(row.values())
+        # file the reviews are appended to, when streaming or at the end of the run
+        sink = self._sink
+        if sink is None and self._save_data_to_disk:
+            sink = self._create_sink()
+        if sink is None or not sink.appends:
+            return self._journal.load(plan)
 
-                except Exception as ex:
-                    self.logger.error(ex)
+        done = self._journal.load(
+            plan, output={"path": sink.path, "position": sink.position()}
+        )
+        # a streamed run that died already wrote some pages to this file (same job_id),
+        # they are written again in page order from the journal
+        sink.rewind(self._journal.output["position"])
+        return done
 
-    def _load_config(self) -> Config:
-        """Loads config.yml"""
+    def _watermark_path(self) -> str:
+        """Path of the watermark file of incremental mode"""
+        dir_path = self._LOCAL_OUTPUT_PATH.format(
+            output_dir=self._config.OUTPUT_DIR, entity_name=self.input_params.hotel_name
+        )
+        return f"{dir_path}/watermark.json"
+
+    @staticmethod
+    def _load_config(**overrides) -> Config:
+        """Loads config.yml
+
+        Args:
+            overrides: config values replacing the ones of the file (e.g. from command line
+                options), the ones that are None are ignored
+        """
         config = None
         with open("config.yml", "r") as file:
             config: dict = yaml.safe_load(file)
 
+        config.update({k: v for k, v in overrides.items() if v is not None})
         config = Config(**config)
         return config
 
@@ -155,25 +436,117 @@ class Scrape:
 
     def _get_max_offset_parameter(self) -> int:
         """Returns the maximum value of offset parameter based on the total number of pages in the html.
-        Offset parameter controls the page number. Page 1 has offset = 0 or no value. Page 2 will have offset=10
-        then Page 3 will have offset=20 and so on.
+        Offset parameter controls the page number. Page 1 has offset = 0 or no value. Page 2 will have offset=rows
+        then Page 3 will have offset=2*rows and so on.
 
         Returns:
             value of offset parameter. 0 when there is only one review page
         """
         self.logger.info("Checking max offset parameter value")
 
-        r = requests.get(
-            self._config.HOTEL_REVIEWS_PAGE,
-            params={
-                "cc1": self.input_params.country,
-                "pagename": self.input_params.hotel_name,
-                "rows": 10,
-            },
-            headers=headers,
+        res_dict = self._scrape({"idx": 0, "url": self._discovery_url()})
+        return self._plan_pages(res_dict)
+
+    def _discovery_url(self) -> str:
+        """Url of the first reviews page, whose pagination gives the max offset parameter.
+        It is requested with the sort order and PAGE_SIZE of the review pages, so it is
+        also the first review page
+        """
+        return self._page_url(0, self._config.PAGE_SIZE)
+
+    def _page_url(self, offset: int, rows: int) -> str:
+        """Url of the reviews page starting at offset
+
+        Args:
+            offset: offset parameter of the page
+            rows: number of reviews per page
+        """
+        params = {
+            "cc1": self.input_params.country,
+            "pagename": self.input_params.hotel_name,
+            "rows": rows,
+            "sort": sort_by_map[self.input_params.sort_by],
+            **self._filter_params(),
+        }
+        # when offset=0 we really don't need its value
+        if offset:
+            params["offset"] = offset
+
+        return (
+            requests.Request("GET", self._config.HOTEL_REVIEWS_PAGE, params=params)
+            .prepare()
+            .url
         )
 
-        soup = BeautifulSoup(r.content.decode(), "html.parser")
+    def _filter_params(self) -> Dict[str, str]:
+        """Query parameters of the review filters of the input params. booking.com only
+        returns (and paginates) the matching reviews
+        """
+        p = self.input_params
+        params = {}
+        if p.language:
+            params["r_lang"] = p.language
+        if p.customer_type:
+            params["customer_type"] = customer_type_map[p.customer_type]
+        if p.score:
+            params["score"] = score_map[p.score]
+        if p.time_of_year:
+            params["time_of_year"] = time_of_year_map[p.time_of_year]
+        return params
+
+    def _filters_suffix(self) -> str:
+        """Suffix of the file names of a filtered scrape e.g. '_en_couple', empty without filters"""
+        p = self.input_params
+        filters = [p.language, p.customer_type, p.score, p.time_of_year]
+        return "".join(f"_{f}" for f in filters if f)
+
+    def _plan_pages(self, res_dict: dict) -> int:
+        """Reads the pagination of the discovery page: sets the number of reviews per page
+        honored by booking.com, and keeps the page to be used as the first review page
+
+        Args:
+            res_dict: {"idx", "response"} of the discovery page
+
+        Returns:
+            value of offset parameter. 0 when there is only one review page
+        """
+        param_offset_max, rows = self._parse_pagination(res_dict["response"].content)
+        if rows != self._config.PAGE_SIZE:
+            self.logger.info(f"PAGE_SIZE {self._config.PAGE_SIZE} capped to {rows}")
+        self._rows = rows
+
+        # when capped, it holds the same reviews as the first page of the honored size
+        with self._prefetched_lock:
+            self._prefetched[self._page_url(0, rows)] = res_dict["response"]
+        return param_offset_max
+
+    def _take_prefetched(self, url_dict: dict) -> dict:
+        """Returns {"idx", "response"} of url_dict when the page was already downloaded
+        while planning, once. None otherwise
+        """
+        with self._prefetched_lock:
+            response = self._prefetched.pop(url_dict["url"], None)
+        if response is None:
+            return None
+        return {"idx": url_dict["idx"], "response": response}
+
+    def _parse_pagination(self, content: bytes) -> Tuple[int, int]:
+        """Returns the max offset parameter and the number of reviews per page from the html
+        of the discovery page. The number of reviews per page is the offset of page 2, which
+        is lower than the requested rows when booking.com caps the page size
+
+        Args:
+            content: html of the discovery page
+
+        Returns:
+            (value of offset parameter, reviews per page). (0, PAGE_SIZE) when there is only one review page
+        """
+        # only the pagination block is needed
+        soup = BeautifulSoup(
+            content.decode(),
+            "html.parser",
+            parse_only=SoupStrainer("div", class_="bui-pagination__pages"),
+        )
         a_elements_with_span = [
             a
             for a in soup.select(
@@ -185,26 +558,17 @@ class Scrape:
         # If there are more than one pages. It means we should have the offset parameter
         if a_elements_with_span:
             if a_elements_with_span[-1].has_attr("href"):
-                # get the href from the a element
-
-                # Parse the URL
-                parsed_url = urlparse(a_elements_with_span[-1]["href"])
-
-                # Extract the query parameters as a dictionary
-                query_parameters = parse_qs(parsed_url.query)
-
-                offset: str = query_parameters["offset"]
-                if isinstance(offset, list):
-                    offset = offset[0]
-                if ";" in offset:
-                    offset = offset.split(";")[0]
-
-                if not offset.isdigit():
-                    self.logger.error(f"Offset paramter is non-digit: {offset}")
-
+                offset = self._link_offset(a_elements_with_span[-1])
                 self.logger.info(f"Offset parameter max value: {offset}")
 
-                return int(offset)
+                # the page links are at multiples of the honored page size, page 2 first
+                offsets = [
+                    self._link_offset(a)
+                    for a in a_elements_with_span
+                    if a.has_attr("href")
+                ]
+                rows = min([o for o in offsets if o > 0] or [self._config.PAGE_SIZE])
+                return offset, min(rows, self._config.PAGE_SIZE)
             else:
                 self.logger.error(
                     f"Page number link <a> does not have href attribute: {a_elements_with_span[-1]}"
@@ -214,47 +578,209 @@ class Scrape:
         else:
             self.logger.info("No offset parameter found")
 
-        return 0
+        return 0, self._config.PAGE_SIZE
+
+    def _link_offset(self, a) -> int:
+        """Returns the offset parameter of a page link of the pagination block
 
-    def _create_urls(self):
+        Args:
+            a: <a> element with an href
+
+        Returns:
+            value of offset parameter, 0 when the link has none
+        """
+        # Parse the URL
+        parsed_url = urlparse(a["href"])
+
+        # Extract the query parameters as a dictionary
+        query_parameters = parse_qs(parsed_url.query)
+
+        offset: str = query_parameters.get("offset", ["0"])
+        if isinstance(offset, list):
+            offset = offset[0]
+        if ";" in offset:
+            offset = offset.split(";")[0]
+
+        if not offset.isdigit():
+            self.logger.error(f"Offset paramter is non-digit: {offset}")
+
+        return int(offset)
+
+    def _create_urls(self, param_offset_max: int = None):
         """It creates list of urls of review pages based on the total reivews
         number of reviews.
 
         Args:
-            hotel_name: name of the hotel on booking.com
+            param_offset_max: max offset parameter, requested from booking.com when None
         """
         ls_urls = []
         self.logger.info("Creating URLs")
-        param_offset_max: int = self._get_max_offset_parameter()
+        if param_offset_max is None:
+            param_offset_max = self._get_max_offset_parameter()
 
         # ********** BASED ON TOTAL REVIEW PAGES: CREATE LIST OF URLS TO SCRAPE **********
 
-        sort_by = sort_by_map[self.input_params.sort_by]
-
         offset_counter = 0
-        params = {
-            "cc1": self.input_params.country,
-            "pagename": self.input_params.hotel_name,
-            "rows": 10,
-            "sort": sort_by,
-        }
-
         while offset_counter <= param_offset_max:
-            # when offset_counter=0 we really don't need its value
-            if offset_counter:
-                params["offset"] = offset_counter
-
-            url = (
-                requests.Request("GET", self._config.HOTEL_REVIEWS_PAGE, params=params)
-                .prepare()
-                .url
-            )
+            url = self._page_url(offset_counter, self._rows)
             ls_urls.append({"idx": offset_counter, "url": url})
-            offset_counter += 10
+            offset_counter += self._rows
 
         self.logger.info(f"Created URLs: {len(ls_urls)}")
         return ls_urls
 
+    def _has_window(self) -> bool:
+        """Whether only the reviews of a date window (since/until) are scraped"""
+        return (
+            self.input_params.since is not None or self.input_params.until is not None
+        )
+
+    def _window_urls(self, ls_urls: List[dict]) -> List[dict]:
+        """Drops the pages outside the since/until date window.
+
+        Pages are sorted by date, so the first and last pages of the window are found by
+        binary search over ls_urls, downloading only the probed pages (O(log pages)
+        requests instead of paging from the top). The probed pages inside the window are
+        not downloaded again.
+
+        Args:
+            ls_urls: list containing url and idx/offset_param of each reviews page
+
+        Returns:
+            the pages of the window, in the same order
+        """
+        if not self._has_window() or not ls_urls:
+            return ls_urls
+
+        since, until = self.input_params.since, self.input_params.until
+        newest_first = self.input_params.sort_by == "newest_first"
+        pool = get_parse_pool(self._config.PARSE_POOL_SIZE)
+        probed: Dict[int, tuple] = {}
+
+        def page_dates(i: int) -> tuple:
+            """(oldest, newest) post date of page i, None when it has no dated review"""
+            if i not in probed:
+                res_dict = self._scrape(ls_urls[i])
+                response = res_dict["response"]
+                page = pool.submit(
+                    parse_page, res_dict["idx"], response.content, self._parser_backend
+                ).result()
+                with self._prefetched_lock:
+                    self._prefetched[ls_urls[i]["url"]] = response
+                dates = [
+                    datetime.strptime(r["review_post_date"], DATE_FORMAT).date()
+                    for r in page["reviews"]
+                    if r["review_post_date"]
+                ]
+                probed[i] = (min(dates), max(dates)) if dates else None
+            return probed[i]
+
+        def before(i: int) -> bool:
+            """Whether all the reviews of page i come before the window in the page order"""
+            bound = until if newest_first else since
+            if bound is None:
+                return False
+            dates = page_dates(i)
+            if dates is None:
+                return False
+            return dates[0] > bound if newest_first else dates[1] < bound
+
+        def after(i: int) -> bool:
+            """Whether all the reviews of page i come after the window in the page order"""
+            bound = since if newest_first else until
+            if bound is None:
+                return False
+            dates = page_dates(i)
+            if dates is None:
+                return False
+            return dates[1] < bound if newest_first else dates[0] > bound
+
+        # first page that is not before the window
+        lo, hi = 0, len(ls_urls)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if before(mid):
+                lo = mid + 1
+            else:
+                hi = mid
+        start = lo
+
+        # first page after the window
+        hi = len(ls_urls)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if after(mid):
+                hi = mid
+            else:
+                lo = mid + 1
+        end = lo
+
+        # the probed pages outside the window are not needed anymore
+        with self._prefetched_lock:
+            for i in probed:
+                if not start <= i < end:
+                    self._prefetched.pop(ls_urls[i]["url"], None)
+
+        self.logger.info(
+            f"Date window: {end - start}/{len(ls_urls)} pages, found with {len(probed)} probes"
+        )
+        return ls_urls[start:end]
+
+    def _filter_window(self, reviews: List[Review]) -> List[Review]:
+        """Keeps the reviews posted inside the since/until date window. Reviews without
+        a post date are dropped
+        """
+        if not self._has_window():
+            return reviews
+
+        since, until = self.input_params.since, self.input_params.until
+        selected = []
+        for review_obj in reviews:
+            if not review_obj["review_post_date"]:
+                continue
+            posted = datetime.strptime(
+                review_obj["review_post_date"], DATE_FORMAT
+            ).date()
+            if (since is None or since <= posted) and (
+                until is None or posted <= until
+            ):
+                selected.append(review_obj)
+        return selected
+
+    def _limit_urls(self, ls_urls: List[dict]) -> List[dict]:
+        """Drops the pages that are not needed to get n_rows reviews
+
+        Args:
+            ls_urls: list containing url and idx/offset_param of each reviews page
+
+        Returns:
+            the urls whose offset (from the first url) is lower than n_rows, or all of them when n_rows is -1
+        """
+        if self.input_params.n_rows == -1 or not ls_urls:
+            return ls_urls
+
+        n_rows = self.input_params.n_rows
+        if self._has_window():
+            # the window starts anywhere in its first page, one more page may be needed
+            n_rows += self._rows
+        first = ls_urls[0]["idx"]
+        return [u for u in ls_urls if u["idx"] - first < n_rows]
+
+    def _prefetch_window(self, window: int) -> Tuple[int, int]:
+        """Number of pages fetched ahead of the page being consumed, in conditional mode
+
+        Args:
+            window: maximum number of pages fetched ahead, from the config
+
+        Returns:
+            (number of pages at the start, maximum number of pages). In incremental mode the
+            window starts at one page and grows up to 2, since a refresh stops in the
+            first pages: a refresh without new reviews only needs the first page
+        """
+        if self._watermark is not None:
+            return 1, min(window, 2)
+        return window, window
+
     def _scrape(self, url_dict: dict) -> dict:
         """Returns the response of the the passed url
 
@@ -268,404 +794,657 @@ class Scrape:
         url = url_dict["url"]  # url of the reviews page
         idx = url_dict["idx"]  # orginal offset_param value / id of reviews page
 
+        # e.g. the first review page was already downloaded by the discovery request
+        res_dict = self._take_prefetched(url_dict)
+        if res_dict is not None:
+            return res_dict
+
+        entry = self._cache.lookup(url) if self._cache is not None else None
+        if entry is not None and entry.is_fresh(self._cache.ttl):
+            response = self._cache.load(url, entry)
+            if response is not None:
+                return {"idx": idx, "response": response}
+            entry = None  # evicted since lookup, fetched like a miss
+        # a stale page is revalidated, the server answers 304 when it did not change
+        validators = entry.validators() if entry is not None else {}
+
         retry_count = 1
         while retry_count <= self._config.MAX_RETIES:
-            response = requests.get(url, headers=headers)
+            self._rate_limiter.acquire()
+            _start = time.perf_counter()
+            try:
+                response = self._sessions.get().get(
+                    url, headers=validators, timeout=self._config.REQUEST_TIMEOUT
+                )
+            except requests.RequestException as ex:
+                # timeouts and connection errors are retried, like non 200 responses
+                if retry_count >= self._config.MAX_RETIES:
+                    raise
+                self.logger.warning(f"Retrying {retry_count} ... {url} ({ex!r})")
+                retry_count += 1
+                continue
+            self._rate_limiter.feedback(response.status_code)
+            self._metrics.request_done(
+                response.status_code,
+                time.perf_counter() - _start,
+                wire_bytes(response),
+            )
+
+            if response.status_code == 304 and entry is not None:
+                cached = self._cache.load(url, entry, revalidated=True)
+                if cached is not None:
+                    response = cached
+                    break
+                # evicted while the request was in flight, fetched again in full
+                entry, validators = None, {}
+                continue
 
             if response.status_code == 200:
+                if self._cache is not None:
+                    self._cache.store(url, response.content, response.headers)
                 break
 
             else:
                 self.logger.warning(f"Retrying {retry_count} ... {url}")
+                self._metrics.retried(response.status_code)
                 retry_count += 1
                 continue
 
         return {"idx": idx, "response": response}
 
-    def _validate(self, element):
-        """
-        Removes multitples spaces and strips \n
+    def _iter_pages(self, ls_urls: List[dict]) -> Iterator[dict]:
+        """Yields the parsed pages in the order of ls_urls, while the next PREFETCH_WINDOW
+        pages are already being fetched and parsed. A page is only requested once the
+        consumer asks for the next one, so nothing is fetched far past where it stops.
+        In incremental mode the window is smaller, see _prefetch_window.
+
+        Closing the generator (or breaking out of a loop on it) cancels the pages that
+        have not started yet, and stops the ones in flight from being parsed.
 
         Args:
-            element: Beautiful Soap element
+            ls_urls: list containing url and idx/offset_param of each reviews page
 
         Returns:
-            string text extracted from element
+            iterator of {"idx": idx, "reviews": []}
         """
-        if element is not None:
-            if isinstance(element, str):
-                text = re.sub(r"\s+", " ", element).strip(" \n")
-            else:
-                text = re.sub(r"\s+", " ", element.text).strip(" \n")
-            if len(text):
-                return text
-
-        return None
-
-    def _parse_scraped_results(
-        self, ls_response: List[dict]
-    ) -> Union[List[dict], None]:
-        """Takes response objects containing html content of a single reviews pages, and parses the data
+        pool = get_parse_pool(self._config.PARSE_POOL_SIZE)
+        stop = threading.Event()
+
+        def fetch_and_parse(url_dict: dict) -> dict:
+            if stop.is_set():
+                return None
+            res_dict = self._scrape(url_dict)
+            if stop.is_set():
+                return None
+            self._metrics.queued(1)
+            try:
+                page = pool.submit(
+                    parse_page,
+                    res_dict["idx"],
+                    res_dict["response"].content,
+                    self._parser_backend,
+                ).result()
+            finally:
+                self._metrics.queued(-1)
+            self._metrics.page_parsed(page)
+            self._count_parsed_page()
+            return page
+
+        ahead, window = self._prefetch_window(self._config.PREFETCH_WINDOW)
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(window, self._config.MAX_CONCURRENCY)
+        )
+        urls = iter(ls_urls)
+        pending = collections.deque(
+            executor.submit(fetch_and_parse, url_dict)
+            for url_dict in itertools.islice(urls, ahead)
+        )
+        try:
+            while pending:
+                page = pending.popleft().result()
+                yield page
+                # the consumer wants the next page, keep the window full
+                ahead = min(ahead + 1, window)
+                for url_dict in itertools.islice(urls, ahead - len(pending)):
+                    pending.append(executor.submit(fetch_and_parse, url_dict))
+        finally:
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _fetch_threaded(self, ls_urls: List[dict], on_result: Callable[[dict], None]):
+        """Fetches all the urls with a pool of threads, one pooled session per thread
 
         Args:
-            ls_response: list of dicts with page-idx and response objects with html { idx and requests.Response object}
-            shared_ls_results: process safe list for appending resutlts
-
-        Returns:
-            None when shared list is passed, otherwise [ {idx of the review page, list of reviews in that page}, ... ]
-        """
-
-        pages_reviews = []
-
-        for (
-            response_dict
-        ) in ls_response:  # iterate on the response objects of review pages
-            page_reviews = []
-            idx = response_dict["idx"]
-            response: requests.Response = response_dict[
-                "response"
-            ]  # current response object
-
-            soup = BeautifulSoup(response.content.decode(), "html.parser")
-            reviews = soup.select("ul.review_list > li")
-
-            for i in range(
-                len(reviews)
-            ):  # iterate on the review items of the current page
-                review = reviews[i]
-                username = self._validate(
-                    review.select_one(
-                        "div.c-review-block__guest span.bui-avatar-block__title"
-                    )
-                )  # .text.strip(' \n')
-                user_country = self._validate(
-                    review.select_one(
-                        "div.c-review-block__guest span.bui-avatar-block__subtitle"
-                    )
-                )  # .text.strip(' \n')
-                room_view = self._validate(
-                    review.select_one(
-                        "div.c-review-block__room-info-row div.bui-list__body"
-                    )
-                )  # .text.strip(' \n')
-
-                stay_duration = self._validate(
-                    review.select_one("ul.c-review-block__stay-date div.bui-list__body")
-                )
-                stay_duration = (
-                    stay_duration.split(" ·")[0] if stay_duration is not None else None
-                )
-
-                stay_type = self._validate(
-                    review.select_one(
-                        "ul.review-panel-wide__traveller_type div.bui-list__body"
-                    )
-                )  # .text.strip(' \n')
-                review_title = self._validate(
-                    review.select_one("h3.c-review-block__title")
-                )  # .text.strip(' \n')
-
-                # Use a lambda function to find the element with inner text containing "Received"
-                date = self._validate(
-                    review.find(
-                        lambda tag: tag.name == "span" and "Reviewed:" in tag.get_text()
-                    )
-                )
-
-                if date:
-                    date = date.split(":")[-1].strip()
-                    date = parser.parse(date).strftime("%m-%d-%Y %H:%M:%S")
-
-                rating = self._validate(
-                    review.select_one("div.bui-review-score__badge")
-                )  # .text.strip(' \n')
-                rating = float(rating) if rating is not None else rating
-                review_text = review.select("div.c-review span.c-review__body")
-
-                review_text_liked = None
-                review_text_disliked = None
-                original_lang = None
-                full_review, en_full_review = None, None
-                if review_text:
-                    review_text_liked = self._validate(review_text[0])
-                    if (
-                        "There are no comments available for this review".lower()
-                        in review_text_liked.lower()
-                    ):
-                        review_text_liked = None
-                    original_lang = review_text[0].get("lang", default=None)
-
-                    if len(review_text) > 1:
-                        review_text_disliked = self._validate(review_text[1])
-                        if review_text_disliked is None:
-                            if len(review_text) > 2:
-                                review_text_disliked = self._validate(review_text[2])
-
-                # Add '.' period sign to the end of each part of the review. If its not already there
-                t_title = f"title: {review_title}" if review_title else ""
-                t_title = (
-                    f"{t_title}."
-                    if t_title and t_title[-1] not in string.punctuation
-                    else t_title
-                )
+            ls_urls: list containing url and idx/offset_param of each reviews page
+            on_result: called from the fetch thread with {"idx", "response"} of each page as soon as it arrives
+        """
 
-                t_liked = f"liked: {review_text_liked}" if review_text_liked else ""
-                t_liked = (
-                    f"{t_liked}."
-                    if t_liked and t_liked[-1] not in string.punctuation
-                    else t_liked
-                )
+        def fetch(url_dict: dict):
+            on_result(self._scrape(url_dict))
 
-                t_disliked = (
-                    f"disliked: {review_text_disliked}" if review_text_disliked else ""
-                )
-                t_disliked = (
-                    f"{t_disliked}."
-                    if t_disliked and t_disliked[-1] not in string.punctuation
-                    else t_disliked
-                )
-
-                full_review = f"{t_title} {t_liked} {t_disliked}"
-                full_review = self._validate(full_review)
-                # ------------------------------------------------
+        # Use ThreadPoolExecutor to parallelize GET requests
+        # the pace is set by the rate limiter inside _scrape
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self._config.MAX_CONCURRENCY
+        ) as executor:
+            futures = [executor.submit(fetch, url_dict) for url_dict in ls_urls]
+            for f in futures:
+                f.result()  # re-raise errors of the fetch threads
 
-                if "en" in original_lang:
-                    en_full_review = full_review
+        self._log_connection_stats()
 
-                found_helpful = self._validate(
-                    review.select_one(
-                        "div.c-review-block__row--helpful-vote p.review-helpful__vote-others-helpful"
-                    )
-                )
+    def _fetch_async(
+        self,
+        ls_urls: List[dict],
+        on_result: Callable[[dict], object],
+        max_pending: int = None,
+    ):
+        """Fetches all the urls on a single event loop, keeping up to MAX_CONCURRENCY
+        requests in flight
 
-                found_helpful = (
-                    0
-                    if found_helpful is None
-                    else int(
-                        found_helpful.split("people")[0].strip()
-                        if "people" in found_helpful
-                        else found_helpful.split("person")[0].strip()
-                    )
-                )
-                found_unhelpful = self._validate(
-                    review.select_one(
-                        "div.c-review-block__row--helpful-vote p.--unhelpful"
-                    )
-                )
-                found_unhelpful = (
-                    0
-                    if found_unhelpful is None
-                    else int(
-                        found_unhelpful.split("people")[0].strip()
-                        if "people" in found_unhelpful
-                        else found_unhelpful.split("person")[0].strip()
-                    )
-                )
+        Args:
+            ls_urls: list containing url and idx/offset_param of each reviews page
+            on_result: called with {"idx", "response"} of each page as soon as it arrives
+            max_pending: at most this many pages are downloaded and not processed, see
+                AsyncFetcher.fetch_all
+        """
+        # pages already downloaded while planning e.g. by the discovery request
+        to_fetch = []
+        for url_dict in ls_urls:
+            res_dict = self._take_prefetched(url_dict)
+            if res_dict is not None:
+                on_result(res_dict)
+            else:
+                to_fetch.append(url_dict)
+        self._create_async_fetcher().run(
+            to_fetch, on_result=on_result, max_pending=max_pending
+        )
 
-                owner_response = review.select(
-                    "div.c-review-block__response span.c-review-block__response__body"
-                )
-                if owner_response:
-                    owner_response = self._validate(owner_response[-1])
-                else:
-                    owner_response = None
-
-                res = {
-                    "username": username,
-                    "user_country": user_country,
-                    "room_view": room_view,
-                    "stay_duration": stay_duration,
-                    "stay_type": stay_type,
-                    "review_post_date": date,
-                    "review_title": review_title,
-                    "rating": rating,
-                    "original_lang": original_lang,
-                    "review_text_liked": review_text_liked,
-                    "review_text_disliked": review_text_disliked,
-                    "full_review": full_review,
-                    "en_full_review": en_full_review,
-                    "found_helpful": found_helpful,
-                    "found_unhelpful": found_unhelpful,
-                    "owner_resp_text": owner_response,
-                }
-                page_reviews.append(res)
-
-            # idx: orginal offset_param value / id of reviews page
-            # reviews: list of reviews found on the page
-            self._parsed_pages_reviews.append({"idx": idx, "reviews": page_reviews})
-            pages_reviews.append({"idx": idx, "reviews": page_reviews})
-
-        return pages_reviews
+    def _create_async_fetcher(self) -> AsyncFetcher:
+        """httpx fetcher sharing the rate limiter of this instance"""
+        return AsyncFetcher(
+            headers,
+            max_concurrency=self._config.MAX_CONCURRENCY,
+            timeout=self._config.REQUEST_TIMEOUT,
+            max_retries=self._config.MAX_RETIES,
+            rate_limiter=self._rate_limiter,
+            logger=self.logger,
+            cache=self._cache,
+            metrics=self._metrics,
+        )
 
     ##########################################################
     # ******** Scraping Modes full/partial ********
     ##########################################################
 
-    def _get_all_reviews(self, ls_urls: List[dict]) -> List[dict]:
+    def _get_all_reviews(
+        self, ls_urls: List[dict], on_reviews: Callable[[List[Review]], None]
+    ) -> int:
         """Gets all the review till the last page
 
+        Pages are parsed while the rest are still downloading: the fetch path sends the
+        idx and html of every page to the shared parsing process pool as soon as it arrives.
+        When the parsers fall behind, the fetch path waits for a free slot, so at most
+        PARSE_QUEUE_SIZE pages are held in memory. Parsed pages are passed on in page order,
+        only the pages that complete ahead of a previous one are buffered.
+
         Args:
             ls_urls: list containing url and idx/offset_param of each reviews page
+            on_reviews: called with the reviews of each page, in the page order
 
         Returns:
-            list of all the reviews
+            number of reviews found
         """
         _start = time.time()
-        self.logger.info(f"Starting Get Requests on {len(ls_urls)} urls")
+        n_reviews = 0
+
+        def count_reviews(reviews: List[Review]):
+            nonlocal n_reviews
+            reviews = self._filter_window(reviews)
+            n_reviews += len(reviews)
+            on_reviews(reviews)
+
+        pages = PageReorderer([u["idx"] for u in ls_urls], count_reviews)
+
+        if self._config.CHECKPOINT:
+            # resume: skip the pages completed by a previous run of the same job
+            done = self._open_journal(ls_urls)
+            if done:
+                self.logger.info(f"Resuming from checkpoint: {len(done)} pages done")
+                for idx, reviews in done.items():
+                    pages.add({"idx": idx, "reviews": reviews})
+                ls_urls = [u for u in ls_urls if u["idx"] not in done]
+
+        self.logger.info(f"Starting Get Requests and Parsing on {len(ls_urls)} urls")
+
+        # *************START: Send get request to all urls and parse the html content*************
+
+        pool = get_parse_pool(self._config.PARSE_POOL_SIZE)
+        parse_slots = threading.BoundedSemaphore(self._config.PARSE_QUEUE_SIZE)
+        # parsed pages are the return values of the pool workers, they come back over the
+        # pool's pipe. The futures are not kept, so a page is released once passed on
+        n_pending = 0
+        all_parsed = threading.Condition()
+        errors = []
+
+        def on_parsed(f: concurrent.futures.Future):
+            nonlocal n_pending
+            self._metrics.queued(-1)
+            try:
+                if f.exception() is not None:
+                    errors.append(f.exception())
+                    return
+                page = f.result()
+                self._metrics.page_parsed(page)
+                if self._journal is not None:
+                    self._journal.append(page)
+                pages.add(page)
+                self._count_parsed_page()
+            except Exception as ex:
+                errors.append(ex)
+            finally:
+                with all_parsed:
+                    n_pending -= 1
+                    all_parsed.notify_all()
+
+        def submit_parse(res_dict: dict) -> concurrent.futures.Future:
+            nonlocal n_pending
+            with all_parsed:
+                n_pending += 1
+            self._metrics.queued(1)
+            f = pool.submit(
+                parse_page,
+                res_dict["idx"],
+                res_dict["response"].content,
+                self._parser_backend,
+            )
+            f.add_done_callback(on_parsed)
+            return f
+
+        def submit_parse_slot(res_dict: dict):
+            parse_slots.acquire()  # wait while PARSE_QUEUE_SIZE pages are pending
+            f = submit_parse(res_dict)
+            f.add_done_callback(lambda _: parse_slots.release())
+
+        try:
+            if self._config.ENGINE == "async":
+                # the fetcher takes the parse slot before the request goes out
+                self._fetch_async(
+                    ls_urls, submit_parse, max_pending=self._config.PARSE_QUEUE_SIZE
+                )
+            else:
+                self._fetch_threaded(ls_urls, submit_parse_slot)
 
-        # *************START: Send get request to all urls and save the response objects*************
+            self.logger.info(
+                f"Finished Get Requests in {time.time() - _start:.1f} seconds"
+            )
 
-        responses = []
-        # Use ThreadPoolExecutor to parallelize GET requests
-        with concurrent.futures.ThreadPoolExecutor(
-            max_workers=self._config.REQUESTS_PER_SECOND
-        ) as executor:
-            # Submit tasks for each URL
-            futures = []
-            cnt = 0
-            for url_dict in ls_urls:
-                f = executor.submit(self._scrape, url_dict)
-                futures.append(f)
-                cnt += 1
-
-                if (
-                    cnt >= self._config.REQUESTS_PER_SECOND
-                ):  # submit no more than x requests/per sec
-                    time.sleep(1)
-                    cnt = 0
-
-            # futures = [executor.submit(self._scrape, url_dict) for url_dict in ls_urls]
-            # Wait for all tasks to complete
-            concurrent.futures.wait(futures)
-            # Use map to get results in the order of submission
-            responses = list(executor.map(lambda f: f.result(), futures))
-
-        self.logger.info(f"Finished Get Requests in {time.time() - _start:.1f} seconds")
+            with all_parsed:
+                all_parsed.wait_for(lambda: n_pending == 0)
+            if errors:
+                raise errors[0]  # re-raise parsing errors
+            pages.flush()
+        finally:
+            if self._journal is not None:
+                self._journal.close()  # keep the completed pages, in case of error
 
         # ************* --------END-------- *************
 
-        self.logger.info(f"Starting Parsing Responses: {len(responses)}")
+        self.logger.info(
+            f"Finished Parsing Responses: {n_reviews} in {time.time() - _start:.1f} seconds"
+        )
 
-        # *************START: Parse the html content from all response objects*************
+        return n_reviews
 
-        # split the list of response object into multiple splits
-        # and send one list to each process
-        ls_p = []
-        for split in np.array_split(responses, PROCESS_POOL_SIZE):
-            if len(split):
-                p = mp.Process(target=self._parse_scraped_results, args=(split,))
-                p.start()
-                ls_p.append(p)
+    def _stop_criteria_met(self, review_obj: Review) -> bool:
+        """Whether scraping should stop at this review: either it matches the stop criteria,
+        or in incremental mode, it was already scraped by a previous run
 
-        self.logger.info(f"Processes launched: {len(ls_p)}")
-        _ = [p.join() for p in ls_p]
+        Args:
+            review_obj: review
 
-        # Sort the list based on the 'idx' key in each dictionary
-        # so that the reviews of the first page, come first
-        ls_reviews = sorted(self._parsed_pages_reviews, key=lambda x: x["idx"])
-        result_list = []
-        _ = [result_list.extend(d["reviews"]) for d in ls_reviews]
+        Returns:
+            True when this review and the following ones should not be scraped
+        """
+        if self._watermark and is_seen(self._watermark, review_obj):
+            return True
 
-        self.logger.info(
-            f"Finished Parsing Responses: {len(result_list)} in {time.time() - _start:.1f} seconds"
-        )
-        # ************* --------END-------- *************
+        stop = self.input_params.stop_critera
+        if stop is None:
+            return False
 
-        return result_list
+        if stop.username.lower().strip() != review_obj["username"].lower().strip():
+            return False
 
-    def _get_cond_reviews(self, ls_urls: List[dict]) -> List[dict]:
-        """Gets reviews based on any filter either n_rows or stoping criteria
+        r_title = (
+            ""
+            if review_obj["review_title"] is None
+            else review_obj["review_title"].lower().strip()
+        )
+        return stop.review_text_title.lower().strip() in r_title
+
+    def _select_page_reviews(
+        self, reviews: List[Review], n_selected: int
+    ) -> Tuple[List[Review], bool]:
+        """Applies the stop criteria and n_rows to the reviews of the next page
 
         Args:
-        ls_urls: list containing url and idx/offset_param of each reviews page
+            reviews: reviews of the page
+            n_selected: number of reviews selected from the previous pages
 
         Returns:
-        list of selected the reviews
-
+            (selected reviews of the page, whether scraping stops after this page)
         """
+        n_rows = self.input_params.n_rows
+        stop_criteria_met = False
+        reviews = self._filter_window(reviews)
 
-        _start = time.time()
-        self.logger.info(f"Starting Conditional Scraping on {len(ls_urls)} urls")
+        if self.input_params.stop_critera or self._watermark:
+            selected = []
+            for review_obj in reviews:
+                if self._stop_criteria_met(review_obj):
+                    stop_criteria_met = True
+                    break
 
-        count_review = 0
-        ls_reviews = []
-        stop_criteria_met = False
+                selected.append(review_obj)
+            reviews = selected
 
-        for url_dict in ls_urls:
-            res_dict: dict = self._scrape(
-                url_dict
-            )  # will return --> {"idx": idx, "response": response}
-            ls_res = self._parse_scraped_results(
-                [res_dict]
-            )  # will return --> [{"idx": idx, "reviews": []}]
-            if ls_res:
-                reviews = ls_res[0]["reviews"]
-                count_review += len(reviews)
-
-                if self.input_params.stop_critera:
-                    for review_obj in reviews:
-                        if (
-                            self.input_params.stop_critera.username.lower().strip()
-                            == review_obj["username"].lower().strip()
-                        ):
-                            r_title = (
-                                ""
-                                if review_obj["review_title"] is None
-                                else review_obj["review_title"].lower().strip()
-                            )
+        if n_rows > -1:
+            reviews = reviews[: n_rows - n_selected]
 
-                            if (
-                                self.input_params.stop_critera.review_text_title.lower().strip()
-                                in r_title
-                            ):
-                                stop_criteria_met = True
-                                break
+        return reviews, stop_criteria_met or -1 < n_rows <= n_selected + len(reviews)
 
-                        ls_reviews.append(review_obj)
+    def _iter_selected_reviews(self, ls_urls: List[dict]) -> Iterator[List[Review]]:
+        """Yields the reviews of each page that pass the n_rows and stop criteria, in the
+        page order. Pages are fetched PREFETCH_WINDOW ahead, see _iter_pages.
 
-                else:
-                    ls_reviews.extend(reviews)
+        Args:
+            ls_urls: list containing url and idx/offset_param of each reviews page
 
-                if stop_criteria_met:
-                    break
+        Returns:
+            iterator of the selected reviews of each page
+        """
+        n_selected = 0
+
+        # pages come in order, the next ones are prefetched while the current one is checked
+        with contextlib.closing(self._iter_pages(ls_urls)) as pages:
+            for page in pages:
+                reviews, done = self._select_page_reviews(page["reviews"], n_selected)
+                n_selected += len(reviews)
+                yield reviews
 
-                if -1 < self.input_params.n_rows <= count_review:
-                    ls_reviews = ls_reviews[: self.input_params.n_rows]
+                if done:
                     break
 
+    def _get_cond_reviews(
+        self, ls_urls: List[dict], on_reviews: Callable[[List[Review]], None]
+    ) -> int:
+        """Gets reviews based on any filter either n_rows or stoping criteria
+
+        Args:
+        ls_urls: list containing url and idx/offset_param of each reviews page
+        on_reviews: called with the selected reviews of each page, in the page order
+
+        Returns:
+        number of selected reviews
+
+        """
+
+        _start = time.time()
+        self.logger.info(f"Starting Conditional Scraping on {len(ls_urls)} urls")
+
+        n_selected = 0
+        for reviews in self._iter_selected_reviews(ls_urls):
+            n_selected += len(reviews)
+            on_reviews(reviews)
+
         self.logger.info(
-            f"Finished Conditional Scraping: {len(ls_reviews)} in {time.time() - _start:.1f} seconds"
+            f"Finished Conditional Scraping: {n_selected} in {time.time() - _start:.1f} seconds"
         )
-        return ls_reviews
+        self._log_connection_stats()
+        return n_selected
 
     ##########################################################
     # ******** Main Executable Method ********
     ##########################################################
 
+    def _is_full_mode(self) -> bool:
+        """Whether all the reviews are scraped, no n_rows, stop criteria or watermark"""
+        # (also the first run of incremental mode, when there is no watermark yet)
+        return (
+            self.input_params.n_rows == -1
+            and self.input_params.stop_critera is None
+            and self._watermark is None
+        )
+
+    def _open_output(self):
+        """Sets where the reviews found by run() go: a list, or the sink when streaming"""
+        self._results = []
+        self._sink = self._create_sink() if self._stream else None
+        self._journal = None  # opened by _get_all_reviews, with CHECKPOINT
+        # size of the appended file before this run, see _close_output
+        self._output_position = (
+            self._sink.position() if self._sink and self._sink.appends else None
+        )
+        self._new_watermark = self._watermark
+
+    def _on_reviews(self, reviews: List[Review]):
+        """Receives the selected reviews of each page, in the page order"""
+        if self._sink is not None:
+            _start = time.perf_counter()
+            self._sink.write(reviews)  # written page by page, nothing is kept
+            self._metrics.written(len(reviews), time.perf_counter() - _start)
+        else:
+            # kept until the end of the run, one copy of each categorical string
+            self._results.extend(intern_reviews(reviews))
+        if self.input_params.incremental:
+            # pages come newest first, so only the first dated page moves it
+            self._new_watermark = advance_watermark(
+                self._new_watermark,
+                self.input_params.hotel_name,
+                self.input_params.country,
+                reviews,
+            )
+
+    def _close_output(self, failed: bool = False):
+        """Closes the sink
+
+        Args:
+            failed: whether the run raised. The rows it streamed are then removed from the
+                file, as the watermark did not move: the next run writes them again. When
+                a checkpoint journal is open, they are kept for the journal to resume
+        """
+        self._execution_finished.set()  # to stop the monitoring thread
+        self._prefetched = {}  # unused when their pages were resumed
+        if self._sink is None:
+            return
+
+        self._sink.close()
+        if failed and self._output_position is not None and self._journal is None:
+            self._sink.rewind(self._output_position)
+            self.logger.warning(
+                f"Run failed, the reviews written to {self._sink.path} were removed"
+            )
+
+    def _finish_run(self, _start: float) -> List[dict]:
+        """Saves the reviews and the watermark once scraping is complete
+
+        Returns:
+            list of the reviews found, empty when streaming
+        """
+        self.logger.info(f"Process complete {time.time() - _start:.1f} seconds")
+        self.logger.info(f"Reviews found: {self.n_reviews_found}")
+        self._metrics.finish()
+
+        if self._owns_sessions:
+            self._sessions.close()
+
+        if self._save_data_to_disk and self._sink is None:
+            self._save_local_files(self._results)
+
+        if self._journal is not None:
+            self._journal.remove()  # the job is complete, nothing to resume
+
+        self._write_metrics_file()
+        self._log_metrics()
+
+        watermark = self._new_watermark
+        if watermark is not self._watermark:
+            save_watermark(self._watermark_path(), watermark)
+            self.logger.info(f"Watermark moved to {watermark.review_post_date}")
+
+        results, self._results = self._results, []
+        return to_dicts(results)
+
     def run(self) -> List[dict]:
         """
         Main function which executes the module
+
+        Returns:
+            list of the reviews found, empty when streaming (see n_reviews_found)
         """
 
         _start = time.time()
-        results = []
-        ls_urls = self._create_urls()
+        self._open_output()
+
+        ls_urls = self._limit_urls(self._window_urls(self._create_urls()))
         prog_thd = threading.Thread(target=self._progress_thread_start, args=(ls_urls,))
         prog_thd.start()
 
-        if self.input_params.n_rows == -1 and self.input_params.stop_critera is None:
-            # it means to get all the reviews, based on the provided/default sort_by option
-            results = self._get_all_reviews(ls_urls)
+        try:
+            if self._is_full_mode():
+                # it means to get all the reviews, based on the provided/default sort_by option
+                self.n_reviews_found = self._get_all_reviews(ls_urls, self._on_reviews)
 
-        else:
-            results = self._get_cond_reviews(ls_urls)
+            else:
+                self.n_reviews_found = self._get_cond_reviews(ls_urls, self._on_reviews)
+        except BaseException:
+            self._close_output(failed=True)
+            raise
+        self._close_output()
 
-        self.logger.info(f"Process complete {time.time() - _start:.1f} seconds")
-        self.logger.info(f"Reviews found: {len(results)}")
+        return self._finish_run(_start)
 
-        self._execution_finished.set()  # to stop the monitoring thread
+    async def run_async(
+        self, executor: concurrent.futures.Executor = None
+    ) -> List[dict]:
+        """Asyncio version of run(), for services that already run an event loop.
 
-        if self._save_data_to_disk:
-            self._save_local_files(results)
+        Pages are fetched with httpx on the running loop (no fetch threads) and parsed in
+        the executor. Pages are processed in order, with PARSE_QUEUE_SIZE pages in flight
+        (PREFETCH_WINDOW with n_rows, stop criteria or incremental mode). Cancelling the
+        task cancels the requests in flight.
 
-        return results
+        Args:
+            executor: executor that parses the pages. Defaults to the process pool shared
+                by every Scrape object of the process (see core/workers.py)
+
+        Returns:
+            list of the reviews found, empty when streaming (see n_reviews_found)
+        """
+        _start = time.time()
+        loop = asyncio.get_running_loop()
+        executor = executor or get_parse_pool(self._config.PARSE_POOL_SIZE)
+        fetcher = self._create_async_fetcher()
+        semaphore = asyncio.Semaphore(self._config.MAX_CONCURRENCY)
+        self._open_output()
+        n_selected = 0
+
+        async def fetch_and_parse(url_dict: dict) -> dict:
+            res_dict = self._take_prefetched(url_dict) or await fetcher.fetch(
+                client, semaphore, url_dict
+            )
+            self._metrics.queued(1)
+            try:
+                page = await loop.run_in_executor(
+                    executor,
+                    parse_page,
+                    res_dict["idx"],
+                    res_dict["response"].content,
+                    self._parser_backend,
+                )
+            finally:
+                self._metrics.queued(-1)
+            self._metrics.page_parsed(page)
+            self._count_parsed_page()
+            return page
+
+        try:
+            async with fetcher.client() as client:
+                self.logger.info("Checking max offset parameter value")
+                res_dict = await fetcher.fetch(
+                    client, semaphore, {"idx": 0, "url": self._discovery_url()}
+                )
+                ls_urls = self._create_urls(
+                    await asyncio.to_thread(self._plan_pages, res_dict)
+                )
+                if self._has_window():
+                    # a few sequential probes, in a thread with the pooled sessions
+                    ls_urls = await asyncio.to_thread(self._window_urls, ls_urls)
+
+                ls_urls = self._limit_urls(ls_urls)
+
+                ahead, window = self._prefetch_window(
+                    self._config.PARSE_QUEUE_SIZE
+                    if self._is_full_mode()
+                    else self._config.PREFETCH_WINDOW
+                )
+                urls = iter(ls_urls)
+                pending = collections.deque(
+                    asyncio.create_task(fetch_and_parse(url_dict))
+                    for url_dict in itertools.islice(urls, ahead)
+                )
+                try:
+                    while pending:
+                        page = await pending.popleft()
+                        reviews, done = self._select_page_reviews(
+                            page["reviews"], n_selected
+                        )
+                        n_selected += len(reviews)
+                        await asyncio.to_thread(self._on_reviews, reviews)
+                        if done:
+                            break
+
+                        # the next page is needed, keep the window full
+                        ahead = min(ahead + 1, window)
+                        for url_dict in itertools.islice(urls, ahead - len(pending)):
+                            pending.append(
+                                asyncio.create_task(fetch_and_parse(url_dict))
+                            )
+                finally:
+                    # on error/cancellation do not leave requests running on a closed client
+                    for task in pending:
+                        task.cancel()
+        except BaseException:  # also cancellation
+            self._close_output(failed=True)
+            raise
+        self._close_output()
+
+        self.n_reviews_found = n_selected
+        return await asyncio.to_thread(self._finish_run, _start)
+
+    def iter_reviews(self) -> Iterator[dict]:
+        """Lazy alternative to run(): yields the reviews in page order, as soon as their
+        page is parsed.
+
+        Only PREFETCH_WINDOW pages are fetched ahead of the consumer. When the consumer
+        stops iterating (break, or close() of the generator), the pages in flight are
+        dropped and no further page is fetched. n_rows and the stop criteria apply as in
+        run(). Nothing is saved to disk, and the watermark of incremental mode is not
+        moved, since the consumer may not have seen all the new reviews.
+
+        Returns:
+            iterator of review objects
+        """
+        ls_urls = self._limit_urls(self._window_urls(self._create_urls()))
+        try:
+            for reviews in self._iter_selected_reviews(ls_urls):
+                self.n_reviews_found += len(reviews)
+                for review in reviews:
+                    yield review.to_dict()
+        finally:
+            self._execution_finished.set()
+            self._prefetched = {}
+            self._metrics.finish()
+            if self._owns_sessions:
+                self._sessions.close()
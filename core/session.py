@@ -0,0 +1,113 @@
+import threading
+from typing import List
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:  # urllib3 only decodes brotli bodies when one of these is installed
+    import brotli  # noqa: F401
+
+    _ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+
+        _ACCEPT_ENCODING = "gzip, deflate, br"
+    except ImportError:
+        _ACCEPT_ENCODING = "gzip, deflate"
+
+
+class _WireCountingAdapter(HTTPAdapter):
+    """HTTPAdapter whose responses count the bytes received, also for chunked bodies.
+
+    urllib3 reads a chunked body chunk by chunk without updating ``response.raw.tell()``,
+    the number of (still compressed) bytes received, see metrics.wire_bytes. Its body is
+    read through http.client instead, which removes the chunked framing itself.
+    """
+
+    def build_response(self, req, resp):
+        resp.chunked = False
+        return super().build_response(req, resp)
+
+
+class SessionPool:
+    """Hands out one pooled ``requests.Session`` per thread.
+
+    ``requests.Session`` is not guaranteed to be thread safe, so every thread of the
+    fetch ThreadPoolExecutor gets its own session. Each session keeps up to ``pool_size``
+    keep-alive connections per host, so consecutive review pages fetched by the same
+    thread reuse the TCP/TLS connection instead of opening a new one.
+    """
+
+    def __init__(self, headers: dict, pool_size: int = 10, keep_alive: bool = True):
+        """
+        Args:
+            headers: default headers sent with every request
+            pool_size: max number of connections kept open per host, per session
+            keep_alive: when False every response closes its connection
+        """
+        self._headers = dict(headers)
+        self._headers.setdefault("Accept-Encoding", _ACCEPT_ENCODING)
+        if not keep_alive:
+            self._headers["Connection"] = "close"
+
+        self._pool_size = pool_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sessions: List[requests.Session] = []
+
+    def get(self) -> requests.Session:
+        """Returns the session of the calling thread, creating it on first use"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self._headers)
+            adapter = _WireCountingAdapter(
+                pool_connections=self._pool_size, pool_maxsize=self._pool_size
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+
+        return session
+
+    def stats(self) -> dict:
+        """Connection usage summed over all the sessions of this pool
+
+        Returns:
+            {"sessions", "connections", "requests", "reused"} where "reused" is the number of
+            requests that were sent on an already open connection
+        """
+        n_conn, n_req = 0, 0
+        with self._lock:
+            sessions = list(self._sessions)
+
+        for session in sessions:
+            # the same adapter is mounted for both http:// and https://
+            for adapter in {id(a): a for a in session.adapters.values()}.values():
+                # urllib3 keeps these counters on every HTTPConnectionPool
+                for key in list(adapter.poolmanager.pools.keys()):
+                    pool = adapter.poolmanager.pools.get(key)
+                    if pool is None:
+                        continue
+                    n_conn += pool.num_connections
+                    n_req += pool.num_requests
+
+        return {
+            "sessions": len(sessions),
+            "connections": n_conn,
+            "requests": n_req,
+            "reused": max(n_req - n_conn, 0),
+        }
+
+    def close(self):
+        """Closes every session and its open connections"""
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+
+        for session in sessions:
+            session.close()
+        self._local = threading.local()
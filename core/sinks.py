@@ -0,0 +1,238 @@
+import csv
+import functools
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Type
+
+from core.review import Review
+from core.watermark import DATE_FORMAT
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # the parquet output format is only available with pyarrow
+    pa, pq = None, None
+
+# columns of the output files, the fields of the reviews built by the parser
+REVIEW_FIELDS = list(Review._fields)
+
+
+class ReviewSink:
+    """Output file that receives the reviews of a scrape in batches (e.g. one page at a
+    time), so they do not have to be kept in memory until the end of the scrape.
+
+    The file is opened on the first non empty batch: no file is created when there are
+    no reviews. CSV and JSONL files are appended to.
+    """
+
+    extension: str = None
+    # whether an existing file is appended to, instead of replaced (parquet) or upserted into (sqlite)
+    appends: bool = False
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: path of the output file
+        """
+        self.path = path
+        self.n_reviews = 0  # number of reviews written so far
+        self._file = None
+
+    def _open(self):
+        raise NotImplementedError
+
+    def _write(self, reviews: List[Review]):
+        raise NotImplementedError
+
+    def write(self, reviews: List[Review]):
+        """Writes reviews to the file
+
+        Args:
+            reviews: list of review objects
+        """
+        if not reviews:
+            return
+
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._open()
+
+        self._write(reviews)
+        self.n_reviews += len(reviews)
+
+    def position(self) -> int:
+        """Size of the file, 0 when it does not exist yet"""
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def rewind(self, position: int):
+        """Drops what was appended to the file after position, e.g. by a run that died.
+        Only before anything is written by this sink, or once it is closed
+        """
+        if self.position() > position:
+            os.truncate(self.path, position)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class CsvSink(ReviewSink):
+    """CSV file with a header row, the header is only written when the file is new"""
+
+    extension = "csv"
+    appends = True
+
+    def _open(self):
+        write_header = self.position() == 0
+        self._file = open(self.path, "a", newline="")
+        self._writer = csv.writer(self._file)
+        if write_header:
+            self._writer.writerow(REVIEW_FIELDS)
+
+    def _write(self, reviews: List[Review]):
+        # the fields of a Review are in REVIEW_FIELDS order
+        self._writer.writerows(reviews)
+        self._file.flush()
+
+
+class JsonlSink(ReviewSink):
+    """JSON lines file, one review object per line"""
+
+    extension = "jsonl"
+    appends = True
+
+    def _open(self):
+        self._file = open(self.path, "a")
+
+    def _write(self, reviews: List[Review]):
+        self._file.writelines(json.dumps(r.to_dict()) + "\n" for r in reviews)
+        self._file.flush()
+
+
+@functools.lru_cache(maxsize=4096)
+def _to_datetime(date: str) -> datetime:
+    return datetime.strptime(date, DATE_FORMAT)
+
+
+class ParquetSink(ReviewSink):
+    """Parquet file with typed columns (review_post_date is a timestamp, rating a float,
+    the helpful votes integers).
+
+    Reviews are buffered until row_group_size of them are there, then written as one row
+    group, so the file is built while scraping. A parquet file can not be appended to:
+    an existing file at path is replaced.
+    """
+
+    extension = "parquet"
+
+    def __init__(
+        self, path: str, row_group_size: int = 10000, compression: str = "zstd"
+    ):
+        """
+        Args:
+            path: path of the output file
+            row_group_size: number of reviews per row group
+            compression: parquet compression codec e.g. 'zstd', 'snappy', 'gzip' or 'none'
+        """
+        if pa is None:
+            raise ImportError(
+                "The parquet output format requires pyarrow: pip install pyarrow"
+            )
+        super().__init__(path)
+        self._row_group_size = row_group_size
+        self._compression = compression
+        self._buffer: List[Review] = []
+        self._schema = pa.schema(
+            [
+                (
+                    field,
+                    {
+                        "review_post_date": pa.timestamp("s"),
+                        "rating": pa.float64(),
+                        "found_helpful": pa.int64(),
+                        "found_unhelpful": pa.int64(),
+                    }.get(field, pa.string()),
+                )
+                for field in REVIEW_FIELDS
+            ]
+        )
+
+    def _open(self):
+        self._file = pq.ParquetWriter(
+            self.path, self._schema, compression=self._compression
+        )
+
+    def _write(self, reviews: List[Review]):
+        self._buffer.extend(reviews)
+        while len(self._buffer) >= self._row_group_size:
+            self._write_row_group(self._buffer[: self._row_group_size])
+            self._buffer = self._buffer[self._row_group_size :]
+
+    def _write_row_group(self, reviews: List[Review]):
+        columns = {field: [r[field] for r in reviews] for field in REVIEW_FIELDS}
+        columns["review_post_date"] = [
+            _to_datetime(d) if d else None for d in columns["review_post_date"]
+        ]
+        self._file.write_table(
+            pa.Table.from_pydict(columns, schema=self._schema),
+            row_group_size=len(reviews),
+        )
+
+    def close(self):
+        if self._file is not None and self._buffer:
+            self._write_row_group(self._buffer)
+            self._buffer = []
+        super().close()
+
+
+SINKS: Dict[str, Type[ReviewSink]] = {
+    "csv": CsvSink,
+    "jsonl": JsonlSink,
+    "parquet": ParquetSink,
+}
+
+
+class PageReorderer:
+    """Forwards the reviews of pages that complete in any order, in the page order.
+
+    A page that arrives before the ones preceding it is buffered until they arrive, so
+    only the out of order pages are held in memory. Thread safe: the pages are forwarded
+    one at a time.
+    """
+
+    def __init__(self, idxs: Iterable[int], on_reviews: Callable[[List[dict]], None]):
+        """
+        Args:
+            idxs: idx of every page, in the page order
+            on_reviews: called with the reviews of each page, in the page order
+        """
+        self._order = list(idxs)
+        self._next = 0  # position in _order of the next page to forward
+        self._buffer: Dict[int, List[dict]] = {}
+        self._on_reviews = on_reviews
+        self._lock = threading.Lock()
+
+    def add(self, page: dict):
+        """
+        Args:
+            page: {"idx", "reviews"} of a parsed page
+        """
+        with self._lock:
+            self._buffer[page["idx"]] = page["reviews"]
+            while (
+                self._next < len(self._order)
+                and self._order[self._next] in self._buffer
+            ):
+                self._on_reviews(self._buffer.pop(self._order[self._next]))
+                self._next += 1
+
+    def flush(self):
+        """Forwards the buffered pages, skipping the ones that never arrived"""
+        with self._lock:
+            for idx in self._order[self._next :]:
+                if idx in self._buffer:
+                    self._on_reviews(self._buffer.pop(idx))
+            self._next = len(self._order)
@@ -0,0 +1,266 @@
+import collections
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from core.review import Review
+from core.sinks import REVIEW_FIELDS, ReviewSink
+from core.watermark import (
+    DATE_FORMAT,
+    FINGERPRINT_VERSION,
+    fingerprint_reviews,
+)
+
+# review_post_date is stored in ISO format, so that it sorts and compares as a date
+_ISO_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_COLUMN_TYPES = {
+    "rating": "REAL",
+    "found_helpful": "INTEGER",
+    "found_unhelpful": "INTEGER",
+}
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS reviews (
+    hotel_name TEXT NOT NULL,
+    country TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    {", ".join(f"{f} {_COLUMN_TYPES.get(f, 'TEXT')}" for f in REVIEW_FIELDS)},
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    PRIMARY KEY (hotel_name, country, fingerprint)
+);
+CREATE INDEX IF NOT EXISTS idx_reviews_country ON reviews (country);
+CREATE INDEX IF NOT EXISTS idx_reviews_post_date ON reviews (hotel_name, country, review_post_date);
+CREATE INDEX IF NOT EXISTS idx_reviews_rating ON reviews (hotel_name, country, rating);
+"""
+
+_COLUMNS = ["hotel_name", "country", "fingerprint"] + REVIEW_FIELDS
+
+_UPSERT = f"""
+INSERT INTO reviews ({", ".join(_COLUMNS)}, first_seen, last_seen)
+VALUES ({", ".join("?" for _ in _COLUMNS)}, ?, ?)
+ON CONFLICT (hotel_name, country, fingerprint) DO UPDATE SET
+    {", ".join(f"{field} = excluded.{field}" for field in REVIEW_FIELDS)},
+    last_seen = excluded.last_seen
+"""
+
+
+def _to_iso(date: Optional[str]) -> Optional[str]:
+    if not date:
+        return None
+    return datetime.strptime(date, DATE_FORMAT).strftime(_ISO_FORMAT)
+
+
+def _from_iso(date: Optional[str]) -> Optional[str]:
+    if not date:
+        return date
+    return datetime.strptime(date, _ISO_FORMAT).strftime(DATE_FORMAT)
+
+
+class ReviewStore:
+    """SQLite database of the reviews of every scrape, one row per review.
+
+    A review is keyed on (hotel_name, country, review_fingerprint), so scraping a hotel
+    again updates its reviews (votes, owner response) instead of duplicating them.
+    Identical reviews (e.g. anonymous, without comment, same day and score) are told
+    apart by their ordinal, see fingerprint_reviews. The
+    database is in WAL mode: it can be queried while a scrape writes to it, and each
+    batch of reviews (e.g. a page) is upserted in a single transaction.
+
+    Thread safe, and several processes (e.g. the hotels of a batch) can write to the
+    same file, writes are serialized by SQLite.
+    """
+
+    def __init__(self, path: str, timeout: float = 30):
+        """
+        Args:
+            path: path of the database file, created when it does not exist
+            timeout: seconds to wait for the write lock held by another connection
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # with WAL, a commit is durable once the WAL is checkpointed, not on every commit
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """Re-keys the reviews stored with a previous version of review_fingerprint"""
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version == FINGERPRINT_VERSION:
+            return
+
+        with self._lock, self._conn:  # one transaction
+            rows = self._conn.execute(
+                "SELECT rowid, * FROM reviews ORDER BY rowid"
+            ).fetchall()
+            seen = collections.defaultdict(collections.Counter)  # per hotel
+            for row in rows:
+                review = {f: row[f] for f in REVIEW_FIELDS}
+                review["review_post_date"] = _from_iso(review["review_post_date"])
+                (fingerprint,) = fingerprint_reviews(
+                    [review], seen[row["hotel_name"], row["country"]]
+                )
+                self._conn.execute(
+                    "UPDATE reviews SET fingerprint = ? WHERE rowid = ?",
+                    (fingerprint, row["rowid"]),
+                )
+            self._conn.execute(f"PRAGMA user_version = {FINGERPRINT_VERSION}")
+
+    def upsert(
+        self,
+        hotel_name: str,
+        country: str,
+        reviews: List[Review],
+        seen: Dict[str, int] = None,
+    ) -> int:
+        """Inserts the reviews of a hotel, or updates them when they are already stored
+
+        Args:
+            hotel_name: name of the hotel on booking.com
+            country: country code of the hotel
+            reviews: list of review objects, in page order
+            seen: fingerprint counts of the reviews upserted before by the same scrape,
+                so that identical reviews in different batches get distinct ordinals
+
+        Returns:
+            number of reviews upserted
+        """
+        now = datetime.now().strftime(_ISO_FORMAT)
+        rows = [
+            (hotel_name, country, fingerprint)
+            + tuple(
+                _to_iso(r[f]) if f == "review_post_date" else r[f]
+                for f in REVIEW_FIELDS
+            )
+            + (now, now)
+            for r, fingerprint in zip(reviews, fingerprint_reviews(reviews, seen))
+        ]
+        with self._lock, self._conn:  # one transaction
+            self._conn.executemany(_UPSERT, rows)
+        return len(rows)
+
+    def reviews(
+        self,
+        hotel_name: str,
+        country: str = None,
+        since: datetime = None,
+        until: datetime = None,
+        min_rating: float = None,
+        max_rating: float = None,
+        limit: int = None,
+    ) -> List[dict]:
+        """Returns the stored reviews of a hotel, newest first
+
+        Args:
+            hotel_name: name of the hotel on booking.com
+            country: country code of the hotel. All the hotels with this name when None
+            since: only the reviews posted at or after this date/datetime
+            until: only the reviews posted at or before this date/datetime (a date includes the whole day)
+            min_rating: only the reviews rated at least this
+            max_rating: only the reviews rated at most this
+            limit: maximum number of reviews
+
+        Returns:
+            list of review objects, with the fields of the output files plus hotel_name,
+            country, first_seen and last_seen
+        """
+        where, params = ["hotel_name = ?"], [hotel_name]
+        if country is not None:
+            where.append("country = ?")
+            params.append(country)
+        if since is not None:
+            where.append("review_post_date >= ?")
+            params.append(since.strftime(_ISO_FORMAT))
+        if until is not None:
+            if not isinstance(until, datetime):
+                until = datetime.combine(until, datetime.max.time())
+            where.append("review_post_date <= ?")
+            params.append(until.strftime(_ISO_FORMAT))
+        if min_rating is not None:
+            where.append("rating >= ?")
+            params.append(min_rating)
+        if max_rating is not None:
+            where.append("rating <= ?")
+            params.append(max_rating)
+
+        sql = f"SELECT * FROM reviews WHERE {' AND '.join(where)} ORDER BY review_post_date DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        reviews = []
+        for row in rows:
+            review = dict(row)
+            review["review_post_date"] = _from_iso(review["review_post_date"])
+            reviews.append(review)
+        return reviews
+
+    def hotels(self) -> List[dict]:
+        """Returns the stored hotels: {"hotel_name", "country", "n_reviews", "newest_review"}"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT hotel_name, country, COUNT(*) AS n_reviews, MAX(review_post_date) AS newest_review "
+                "FROM reviews GROUP BY hotel_name, country ORDER BY hotel_name, country"
+            ).fetchall()
+        hotels = [dict(row) for row in rows]
+        for hotel in hotels:
+            hotel["newest_review"] = _from_iso(hotel["newest_review"])
+        return hotels
+
+    def count(self, hotel_name: str = None, country: str = None) -> int:
+        """Number of stored reviews, of a hotel when hotel_name is passed"""
+        where, params = [], []
+        if hotel_name is not None:
+            where.append("hotel_name = ?")
+            params.append(hotel_name)
+        if country is not None:
+            where.append("country = ?")
+            params.append(country)
+        sql = "SELECT COUNT(*) FROM reviews"
+        if where:
+            sql += f" WHERE {' AND '.join(where)}"
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SqliteSink(ReviewSink):
+    """Output to a ReviewStore: every batch of reviews (e.g. a page when streaming) is
+    upserted in one transaction. The database is shared by all the scrapes, a review
+    scraped again is updated instead of duplicated.
+    """
+
+    extension = "sqlite"
+
+    def __init__(self, path: str, hotel_name: str, country: str):
+        """
+        Args:
+            path: path of the database file
+            hotel_name: name of the hotel of the reviews
+            country: country code of the hotel
+        """
+        super().__init__(path)
+        self._hotel_name = hotel_name
+        self._country = country
+        # ordinals of identical reviews count over the whole scrape, not per batch
+        self._seen = collections.Counter()
+
+    def _open(self):
+        self._file = ReviewStore(self.path)
+
+    def _write(self, reviews: List[Review]):
+        self._file.upsert(self._hotel_name, self._country, reviews, seen=self._seen)
@@ -0,0 +1,171 @@
+import collections
+import hashlib
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from core.data_models import Watermark
+from core.review import Review
+
+DATE_FORMAT = "%m-%d-%Y %H:%M:%S"  # format of the review_post_date field
+
+# fields hashed by each version of review_fingerprint, stored fingerprints keep their version
+_FINGERPRINT_FIELDS = {
+    1: (
+        "username",
+        "user_country",
+        "review_post_date",
+        "review_title",
+        "rating",
+        "full_review",
+    ),
+    # the stay details tell apart anonymous reviews without comment of the same day and score
+    2: (
+        "username",
+        "user_country",
+        "room_view",
+        "stay_duration",
+        "stay_type",
+        "review_post_date",
+        "review_title",
+        "rating",
+        "full_review",
+    ),
+}
+FINGERPRINT_VERSION = 2
+
+
+def review_fingerprint(
+    review: Review, ordinal: int = 0, version: int = FINGERPRINT_VERSION
+) -> str:
+    """Stable hash of the fields of a review that do not change between scrapes
+
+    Args:
+        review: review built by the parser
+        ordinal: number of identical reviews (same fingerprint) before this one, so that
+            identical reviews get distinct fingerprints, see fingerprint_reviews
+        version: version of the hashed fields, of previously stored fingerprints
+
+    Returns:
+        hex digest
+    """
+    key = "\x1f".join(str(review.get(field)) for field in _FINGERPRINT_FIELDS[version])
+    if ordinal:
+        key += f"\x1f#{ordinal}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def fingerprint_reviews(
+    reviews: List[Review], seen: Dict[str, int] = None
+) -> List[str]:
+    """Fingerprints of reviews in page order, the n-th review identical to a previous one
+    gets ordinal n instead of the same fingerprint
+
+    Args:
+        reviews: reviews in page order
+        seen: {fingerprint: number of reviews} of the previous batches of the same scrape,
+            updated in place. When None, ordinals only count within reviews
+
+    Returns:
+        fingerprint of each review
+    """
+    seen = collections.Counter() if seen is None else seen
+    fingerprints = []
+    for review in reviews:
+        fingerprint = review_fingerprint(review)
+        fingerprints.append(review_fingerprint(review, ordinal=seen[fingerprint]))
+        seen[fingerprint] += 1
+    return fingerprints
+
+
+def load_watermark(path: str) -> Optional[Watermark]:
+    """Returns the watermark stored at path, None when there is none"""
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "r") as file:
+        return Watermark.model_validate_json(file.read())
+
+
+def save_watermark(path: str, watermark: Watermark):
+    """Writes the watermark to path, replacing the previous one atomically"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as file:
+        file.write(watermark.model_dump_json(indent=2))
+    os.replace(tmp_path, path)
+
+
+def is_seen(watermark: Optional[Watermark], review: Review) -> bool:
+    """Whether the review was already scraped by a previous incremental run.
+    Reviews are sorted by newest_first, so everything posted before the watermark date is old.
+
+    Args:
+        watermark: watermark of the hotel, None on the first run
+        review: review built by the parser
+
+    Returns:
+        True when the review is not newer than the watermark
+    """
+    if watermark is None or not review["review_post_date"]:
+        return False
+
+    posted = datetime.strptime(review["review_post_date"], DATE_FORMAT)
+    mark = datetime.strptime(watermark.review_post_date, DATE_FORMAT)
+    if posted != mark:
+        return posted < mark
+
+    # reviews of the same day can be posted after the last run
+    fingerprint = review_fingerprint(review, version=watermark.fingerprint_version)
+    return fingerprint in watermark.fingerprints
+
+
+def advance_watermark(
+    watermark: Optional[Watermark],
+    hotel_name: str,
+    country: str,
+    new_reviews: List[Review],
+) -> Optional[Watermark]:
+    """Returns the watermark moved to the newest of new_reviews
+
+    Args:
+        watermark: current watermark of the hotel, None on the first run
+        hotel_name: name of the hotel on booking.com
+        country: country code of the hotel
+        new_reviews: reviews scraped by this run
+
+    Returns:
+        updated watermark, None when there are no dated reviews at all
+    """
+    dated = [r for r in new_reviews if r["review_post_date"]]
+    if not dated:
+        return watermark
+
+    newest = max(datetime.strptime(r["review_post_date"], DATE_FORMAT) for r in dated)
+    newest_str = newest.strftime(DATE_FORMAT)
+    version = FINGERPRINT_VERSION
+    fingerprints = set()
+
+    if watermark is not None:
+        mark = datetime.strptime(watermark.review_post_date, DATE_FORMAT)
+        if mark > newest:
+            return watermark
+        if mark == newest:
+            # same day: the fingerprints of the previous runs are kept, in their version
+            version = watermark.fingerprint_version
+            fingerprints.update(watermark.fingerprints)
+
+    fingerprints.update(
+        review_fingerprint(r, version=version)
+        for r in dated
+        if r["review_post_date"] == newest_str
+    )
+
+    return Watermark(
+        hotel_name=hotel_name,
+        country=country,
+        review_post_date=newest_str,
+        fingerprints=sorted(fingerprints),
+        fingerprint_version=version,
+        updated_at=datetime.now().strftime(DATE_FORMAT),
+    )
@@ -0,0 +1,58 @@
+import atexit
+import concurrent.futures
+import multiprocessing as mp
+import os
+import threading
+
+_parse_pool: concurrent.futures.ProcessPoolExecutor = None
+_parse_pool_lock = threading.Lock()
+
+
+def get_parse_pool(size: int = None) -> concurrent.futures.ProcessPoolExecutor:
+    """Returns the process pool used for parsing review pages.
+
+    The pool is created on first use and then shared by every Scrape object of the
+    process, so the worker processes are started once and live across runs and hotels.
+    A pool broken by the death of a worker (e.g. killed when out of memory) is replaced,
+    so it only fails the pages that were in flight.
+
+    Workers are started by a fork server (spawned where there is none): forking the
+    scraping process, which runs fetch and progress threads, could deadlock.
+
+    Args:
+        size: number of worker processes. Defaults to the number of CPUs.
+            Only used when the pool is created
+
+    Returns:
+        shared ProcessPoolExecutor
+    """
+    global _parse_pool
+
+    with _parse_pool_lock:
+        if _parse_pool is not None and _parse_pool._broken:
+            _parse_pool.shutdown(wait=False, cancel_futures=True)
+            _parse_pool = None
+        if _parse_pool is None:
+            if "forkserver" in mp.get_all_start_methods():
+                context = mp.get_context("forkserver")
+                # workers are forked with the parser (lxml, bs4) already imported
+                context.set_forkserver_preload(["core.parser"])
+            else:
+                context = mp.get_context("spawn")
+            _parse_pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=size or os.cpu_count() or 1, mp_context=context
+            )
+        return _parse_pool
+
+
+def shutdown_parse_pool():
+    """Stops the worker processes of the parsing pool, if it was started"""
+    global _parse_pool
+
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(wait=True, cancel_futures=True)
+            _parse_pool = None
+
+
+atexit.register(shutdown_parse_pool)
@@ -1,3 +1,5 @@
+from concurrent.futures import Executor
+from datetime import date
 from logging import Logger
 from typing import List
 
@@ -48,6 +50,55 @@ def execute(
             rich_help_panel="Secondary Arguments",
         ),
     ] = None,
+    incremental: Annotated[
+        bool,
+        typer.Option(
+            help="Only scrape the reviews posted since the previous incremental run of this hotel, and append them to its csv file",
+            rich_help_panel="Secondary Arguments",
+        ),
+    ] = False,
+    language: Annotated[
+        str,
+        typer.Option(
+            help="Only scrape the reviews written in this language e.g. 'en' or 'es'",
+            rich_help_panel="Review Filters",
+        ),
+    ] = None,
+    customer_type: Annotated[
+        str,
+        typer.Option(
+            help="Only scrape the reviews of 'business', 'couple', 'family', 'friends' or 'solo' travellers",
+            rich_help_panel="Review Filters",
+        ),
+    ] = None,
+    score: Annotated[
+        str,
+        typer.Option(
+            help="Only scrape the reviews scored 'superb' (9+), 'good' (7-9), 'passable' (5-7), 'poor' (3-5) or 'very_poor' (1-3)",
+            rich_help_panel="Review Filters",
+        ),
+    ] = None,
+    time_of_year: Annotated[
+        str,
+        typer.Option(
+            help="Only scrape the reviews of stays in 'mar_may', 'jun_aug', 'sep_nov' or 'dec_feb'",
+            rich_help_panel="Review Filters",
+        ),
+    ] = None,
+    since: Annotated[
+        str,
+        typer.Option(
+            help="Only scrape the reviews posted on or after this date (YYYY-MM-DD). Sorts by 'newest_first' unless 'oldest_first' is set",
+            rich_help_panel="Review Filters",
+        ),
+    ] = None,
+    until: Annotated[
+        str,
+        typer.Option(
+            help="Only scrape the reviews posted on or before this date (YYYY-MM-DD)",
+            rich_help_panel="Review Filters",
+        ),
+    ] = None,
     save_review_to_disk: Annotated[
         bool,
         typer.Option(
@@ -55,12 +106,47 @@ def execute(
             rich_help_panel="Secondary Arguments",
         ),
     ] = True,
+    stream: Annotated[
+        bool,
+        typer.Option(
+            help="Write the reviews to disk page by page while scraping, instead of keeping them all in memory",
+            rich_help_panel="Secondary Arguments",
+        ),
+    ] = False,
+    output_format: Annotated[
+        str,
+        typer.Option(
+            help="Format of the reviews file: 'csv', 'jsonl', 'parquet' or 'sqlite'. Defaults to OUTPUT_FORMAT of config.yml",
+            rich_help_panel="Secondary Arguments",
+        ),
+    ] = None,
+    record_dir: Annotated[
+        str,
+        typer.Option(
+            help="Save every fetched review page to this directory, to replay the scrape later with --replay-dir",
+            rich_help_panel="Secondary Arguments",
+        ),
+    ] = None,
+    replay_dir: Annotated[
+        str,
+        typer.Option(
+            help="Scrape the pages recorded with --record-dir in this directory, without any network call",
+            rich_help_panel="Secondary Arguments",
+        ),
+    ] = None,
 ):
     input_params = {
         "hotel_name": hotel_name,
         "country": country,
         "sort_by": sort_by,
         "n_rows": n_reviews,
+        "incremental": incremental,
+        "language": language,
+        "customer_type": customer_type,
+        "score": score,
+        "time_of_year": time_of_year,
+        "since": since,
+        "until": until,
     }
 
     if stop_criteria_username:
@@ -71,9 +157,22 @@ def execute(
 
         input_params["stop_critera"] = stop
 
-    s = Scrape(input_params, save_data_to_disk=save_review_to_disk)
-    ls_reviews = s.run()
-    print(f"Scrapping Complete: Total Reviews  {len(ls_reviews)}")
+    overrides = {"OUTPUT_FORMAT": output_format}
+    if record_dir or replay_dir:
+        overrides.update(
+            HTTP_CACHE=True,
+            HTTP_CACHE_DIR=replay_dir or record_dir,
+            HTTP_CACHE_MODE="replay" if replay_dir else "record",
+        )
+
+    s = Scrape(
+        input_params,
+        save_data_to_disk=save_review_to_disk,
+        config=Scrape._load_config(**overrides),
+        stream=stream,
+    )
+    s.run()
+    print(f"Scrapping Complete: Total Reviews  {s.n_reviews_found}")
 
 
 def run_as_module(
@@ -85,6 +184,15 @@ def run_as_module(
     stop_cri_user: str = "",
     stop_cri_title: str = "",
     logger: Logger | None = None,
+    incremental: bool = False,
+    stream: bool = False,
+    output_format: str | None = None,
+    language: str | None = None,
+    customer_type: str | None = None,
+    score: str | None = None,
+    time_of_year: str | None = None,
+    since: str | date | None = None,
+    until: str | date | None = None,
 ) -> List[dict]:
     """To run the scrapper as module by third party code
 
@@ -96,13 +204,138 @@ def run_as_module(
         save_to_disk: Whether to save both metadata and reviews to disk
         stop_cri_user: Username of the review. Stop further scraping when review of this username is found
         stop_cri_title: Review title to find. Stop further scraping when given username and review title is found
+        logger: Logger to use instead of the default console and file logger
+        incremental: Only scrape the reviews posted since the previous incremental run of this hotel
+        stream: Write the reviews to disk page by page while scraping, so memory stays flat whatever the
+            size of the hotel. An empty list is returned
+        output_format: Format of the reviews file: 'csv', 'jsonl', 'parquet' or 'sqlite'. Defaults to OUTPUT_FORMAT of config.yml
+        language: Only scrape the reviews written in this language e.g. 'en' or 'es'
+        customer_type: Only scrape the reviews of 'business', 'couple', 'family', 'friends' or 'solo' travellers
+        score: Only scrape the reviews scored 'superb' (9+), 'good' (7-9), 'passable' (5-7), 'poor' (3-5) or 'very_poor' (1-3)
+        time_of_year: Only scrape the reviews of stays in 'mar_may', 'jun_aug', 'sep_nov' or 'dec_feb'
+        since: Only scrape the reviews posted on or after this date ('YYYY-MM-DD' or date). Only the pages
+            of the since/until window are fetched, they are found by binary search over the pages
+        until: Only scrape the reviews posted on or before this date ('YYYY-MM-DD' or date)
+    """
+
+    input_params = _input_params(
+        hotel_name,
+        country,
+        sort_by,
+        n_reviews,
+        stop_cri_user,
+        stop_cri_title,
+        incremental,
+        language=language,
+        customer_type=customer_type,
+        score=score,
+        time_of_year=time_of_year,
+        since=since,
+        until=until,
+    )
+
+    s = Scrape(
+        input_params,
+        save_data_to_disk=save_to_disk,
+        logger=logger,
+        config=Scrape._load_config(OUTPUT_FORMAT=output_format),
+        stream=stream,
+    )
+    ls_reviews = s.run()
+    print(f"Scrapping Complete: Total Reviews  {s.n_reviews_found}")
+    return ls_reviews
+
+
+async def scrape_reviews(
+    hotel_name: str,
+    country: str,
+    sort_by: str = "newest_first",
+    n_reviews: int = -1,
+    save_to_disk: bool = True,
+    stop_cri_user: str = "",
+    stop_cri_title: str = "",
+    logger: Logger | None = None,
+    incremental: bool = False,
+    stream: bool = False,
+    output_format: str | None = None,
+    executor: Executor | None = None,
+    language: str | None = None,
+    customer_type: str | None = None,
+    score: str | None = None,
+    time_of_year: str | None = None,
+    since: str | date | None = None,
+    until: str | date | None = None,
+) -> List[dict]:
+    """Async version of run_as_module, to scrape from code that runs an event loop
+    (e.g. aiohttp/FastAPI services). Requires httpx.
+
+    Requests are sent on the caller's event loop, no thread is started for fetching.
+    Several hotels can be scraped concurrently with asyncio.gather, their pages are parsed
+    by the same executor. Cancelling the task stops the scrape.
+
+    Args:
+        hotel_name: Hotel name from booking.com url
+        country: Two character country code (ALPHA-2 code) e.g. 'us'. Visit this link: https://www.iban.com/country-codes
+        sort_by: Sort the reviews by  ['most_relevant', 'newest_first', 'oldest_first', 'highest_scores' or 'lowest_scores']
+        n_reviews: Number of reviews to scrape from the top. -1 means scrape all. The reviews will be scraped according to the 'sort_by' option
+        save_to_disk: Whether to save both metadata and reviews to disk
+        stop_cri_user: Username of the review. Stop further scraping when review of this username is found
+        stop_cri_title: Review title to find. Stop further scraping when given username and review title is found
+        logger: Logger to use instead of the default console and file logger
+        incremental: Only scrape the reviews posted since the previous incremental run of this hotel
+        stream: Write the reviews to disk page by page while scraping. An empty list is returned
+        output_format: Format of the reviews file: 'csv', 'jsonl', 'parquet' or 'sqlite'. Defaults to OUTPUT_FORMAT of config.yml
+        executor: Executor parsing the pages. Defaults to the parsing process pool shared by all the scrapes of the process
+        language, customer_type, score, time_of_year, since, until: review filters, see run_as_module
     """
+    input_params = _input_params(
+        hotel_name,
+        country,
+        sort_by,
+        n_reviews,
+        stop_cri_user,
+        stop_cri_title,
+        incremental,
+        language=language,
+        customer_type=customer_type,
+        score=score,
+        time_of_year=time_of_year,
+        since=since,
+        until=until,
+    )
+
+    s = Scrape(
+        input_params,
+        save_data_to_disk=save_to_disk,
+        logger=logger,
+        config=Scrape._load_config(OUTPUT_FORMAT=output_format),
+        stream=stream,
+    )
+    return await s.run_async(executor=executor)
+
+
+def _input_params(
+    hotel_name: str,
+    country: str,
+    sort_by: str,
+    n_reviews: int,
+    stop_cri_user: str,
+    stop_cri_title: str,
+    incremental: bool,
+    **filters,
+) -> dict:
+    """Input params of Scrape from the arguments of run_as_module/scrape_reviews
 
+    Args:
+        filters: review filters (language, customer_type, score, time_of_year, since, until), None when not set
+    """
     input_params = {
         "hotel_name": hotel_name,
         "country": country,
         "sort_by": sort_by,
         "n_rows": n_reviews,
+        "incremental": incremental,
+        **filters,
     }
 
     if stop_cri_user:
@@ -113,10 +346,7 @@ def run_as_module(
 
         input_params["stop_critera"] = stop
 
-    s = Scrape(input_params, save_data_to_disk=save_to_disk, logger=logger)
-    ls_reviews = s.run()
-    print(f"Scrapping Complete: Total Reviews  {len(ls_reviews)}")
-    return ls_reviews
+    return input_params
 
 
 if __name__ == "__main__":
@@ -0,0 +1,75 @@
+from logging import Logger
+from typing import List
+
+import typer
+from core.batch import BatchRunner
+from core.scrape import Scrape
+from typing_extensions import Annotated
+
+
+def execute(
+    manifest: Annotated[
+        str,
+        typer.Argument(
+            default=...,
+            help="CSV (with header) or JSONL file with the columns: hotel_name, country, sort_by, n_reviews",
+        ),
+    ],
+    save_review_to_disk: Annotated[
+        bool,
+        typer.Option(
+            help="Whehter to save reviews on the local disk or not",
+            rich_help_panel="Secondary Arguments",
+        ),
+    ] = True,
+    output_format: Annotated[
+        str,
+        typer.Option(
+            help="Format of the reviews file: 'csv', 'jsonl', 'parquet' or 'sqlite'. Defaults to OUTPUT_FORMAT of config.yml",
+            rich_help_panel="Secondary Arguments",
+        ),
+    ] = None,
+):
+    runner = BatchRunner(
+        BatchRunner.load_manifest(manifest),
+        save_data_to_disk=save_review_to_disk,
+        config=Scrape._load_config(OUTPUT_FORMAT=output_format),
+    )
+    summary = runner.run()
+    failed = [s for s in summary if s["error"]]
+    print(
+        f"Scrapping Complete: {len(summary)} hotels, {sum(s['n_reviews'] for s in summary)} reviews, {len(failed)} failed"
+    )
+
+
+def run_batch_as_module(
+    manifest: str | List[dict],
+    save_to_disk: bool = True,
+    logger: Logger | None = None,
+    output_format: str | None = None,
+) -> List[dict]:
+    """To run the batch scrapper as module by third party code
+
+    Args:
+        manifest: path of a CSV/JSONL manifest, or list of {"hotel_name", "country", "sort_by", "n_reviews"}
+        save_to_disk: Whether to save the reviews of each hotel to disk
+        logger: Logger to use instead of the root logger
+        output_format: Format of the reviews files: 'csv', 'jsonl' or 'parquet'. Defaults to OUTPUT_FORMAT of config.yml
+
+    Returns:
+        one summary per hotel: {"hotel_name", "country", "sort_by", "n_reviews", "error"}
+    """
+    if isinstance(manifest, str):
+        manifest = BatchRunner.load_manifest(manifest)
+
+    runner = BatchRunner(
+        manifest,
+        save_data_to_disk=save_to_disk,
+        logger=logger,
+        config=Scrape._load_config(OUTPUT_FORMAT=output_format),
+    )
+    return runner.run()
+
+
+if __name__ == "__main__":
+    typer.run(execute)
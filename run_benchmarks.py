@@ -0,0 +1,312 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import typer
+from core.cache import ResponseCache
+from core.data_models import (
+    Config,
+    customer_type_map,
+    score_map,
+    sort_by_map,
+    time_of_year_map,
+)
+from core.parser import PARSER_BACKENDS, normalize_review_date, parse_page
+from core.scrape import Scrape
+from core.sinks import CsvSink
+from core.watermark import DATE_FORMAT
+from typing_extensions import Annotated
+
+
+def load_fixtures(fixtures_dir: str) -> Dict[str, bytes]:
+    """Reads the pages recorded with `run.py --record-dir`
+
+    Args:
+        fixtures_dir: directory of the recording
+
+    Returns:
+        {url: html} of every recorded page
+    """
+    pages = dict(ResponseCache(fixtures_dir, mode="replay").iter_recorded())
+    if not pages:
+        raise typer.BadParameter(f"No recorded pages in {fixtures_dir}")
+    return pages
+
+
+def _best_time(fn: Callable[[], int], repeat: int) -> Tuple[float, int]:
+    """Runs fn repeat times
+
+    Args:
+        fn: benchmarked function, returns the number of items (e.g. reviews) it processed
+        repeat: number of runs
+
+    Returns:
+        (seconds of the fastest run, number of items)
+    """
+    best, n_items = None, 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        n_items = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, n_items
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """Serves the recorded pages by path and query, in place of booking.com"""
+
+    protocol_version = "HTTP/1.1"
+    pages: Dict[str, bytes] = {}
+    served: Dict[str, int] = {"found": 0, "missing": 0}  # requests since the last reset
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        content = self.pages.get(self.path)
+        with self.lock:
+            self.served["found" if content is not None else "missing"] += 1
+        self.send_response(200 if content is not None else 404)
+        content = content or b""
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+def _recorded_input(urls: List[str]) -> Tuple[dict, int]:
+    """Scrape input params of a recording, read from the query of its urls
+
+    Returns:
+        (input params, with the review filters of the recording, number of reviews per page)
+    """
+    for url in urls:
+        query = parse_qs(urlsplit(url).query, keep_blank_values=True)
+        if "sort" in query:
+            if "rows" not in query:
+                raise typer.BadParameter(
+                    "The recording has no 'rows' parameter, it was made before PAGE_SIZE: record it again"
+                )
+
+            def reverse(value_map: Dict[str, str], param: str) -> str:
+                if param not in query:
+                    return None
+                return {v: k for k, v in value_map.items()}[query[param][0]]
+
+            params = {
+                "hotel_name": query["pagename"][0],
+                "country": query["cc1"][0],
+                "sort_by": reverse(sort_by_map, "sort"),
+                "language": query["r_lang"][0] if "r_lang" in query else None,
+                "customer_type": reverse(customer_type_map, "customer_type"),
+                "score": reverse(score_map, "score"),
+                "time_of_year": reverse(time_of_year_map, "time_of_year"),
+            }
+            return params, int(query["rows"][0])
+    raise typer.BadParameter("The recording has no review pages")
+
+
+def bench_parse(pages: Dict[str, bytes], repeat: int) -> Dict[str, float]:
+    """Single process parsing throughput of each parser backend"""
+    results = {}
+    contents = list(pages.values())
+    for backend in PARSER_BACKENDS:
+
+        def parse_all() -> int:
+            return sum(len(parse_page(0, c, backend)["reviews"]) for c in contents)
+
+        seconds, n_reviews = _best_time(parse_all, repeat)
+        results[f"parse_{backend}_pages_per_sec"] = len(contents) / seconds
+        results[f"parse_{backend}_reviews_per_sec"] = n_reviews / seconds
+    return results
+
+
+def bench_dates(reviews: List[dict], repeat: int) -> Dict[str, float]:
+    """Throughput of normalize_review_date, with an empty and a warm memo"""
+    # back to the text shown on the pages e.g. '12 March 2024'
+    dates = [
+        datetime.strptime(r["review_post_date"], DATE_FORMAT).strftime("%d %B %Y")
+        for r in reviews
+        if r["review_post_date"]
+    ]
+
+    def per_sec(fn: Callable[[], int]) -> float:
+        seconds, n_dates = _best_time(fn, repeat)
+        return n_dates / seconds
+
+    def normalize_cold() -> int:
+        normalize_review_date.cache_clear()
+        for d in dates:
+            normalize_review_date(d)
+        return len(dates)
+
+    def normalize_warm() -> int:
+        for d in dates:
+            normalize_review_date(d)
+        return len(dates)
+
+    return {
+        "dates_cold_per_sec": per_sec(normalize_cold),
+        "dates_warm_per_sec": per_sec(normalize_warm),
+    }
+
+
+def bench_csv(reviews: List[dict], repeat: int) -> Dict[str, float]:
+    """Throughput of the CSV output sink"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+
+        def write_csv() -> int:
+            sink = CsvSink(os.path.join(tmp_dir, "reviews.csv"))
+            sink.write(reviews)
+            sink.close()
+            os.remove(sink.path)
+            return len(reviews)
+
+        seconds, n_reviews = _best_time(write_csv, repeat)
+        return {"csv_reviews_per_sec": n_reviews / seconds}
+
+
+def bench_end_to_end(
+    pages: Dict[str, bytes], repeat: int, window: dict = None
+) -> Dict[str, float]:
+    """Throughput of Scrape.run() against a local server serving the recorded pages
+
+    Args:
+        pages: {url: html} of the recording
+        repeat: number of runs
+        window: since/until of a recording made with a date window, they are not in the urls
+
+    Returns:
+        results of the benchmark
+    """
+    _StandInHandler.pages = {
+        f"{urlsplit(url).path}?{urlsplit(url).query}": content
+        for url, content in pages.items()
+    }
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    url = urlsplit(next(iter(pages)))
+    input_params, rows = _recorded_input(list(pages))
+    input_params.update(window or {})
+    logger = logging.getLogger("benchmarks")
+    logger.setLevel(logging.WARNING)
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config = Config(
+                HOTEL_REVIEWS_PAGE=f"http://127.0.0.1:{server.server_port}{url.path}",
+                OUTPUT_DIR=tmp_dir,
+                REQUESTS_PER_SECOND=10000,
+                CHECKPOINT=False,
+                PAGE_SIZE=rows,
+                MAX_RETIES=1,
+            )
+
+            def scrape() -> int:
+                _StandInHandler.served.update(found=0, missing=0)
+                s = Scrape(input_params, logger=logger, config=config)
+                return len(s.run())
+
+            seconds, n_reviews = _best_time(scrape, repeat)
+    finally:
+        server.shutdown()
+
+    served = _StandInHandler.served
+    if served["missing"] or not n_reviews:
+        raise typer.BadParameter(
+            f"The scrape does not replay the recording: {n_reviews} reviews, "
+            f"{served['missing']} requests for pages that are not recorded"
+            + ("" if window else " (pass --since/--until for a date window recording)")
+        )
+
+    # pages served in the last run, the discovery page is also the first review page
+    return {
+        "run_pages_per_sec": served["found"] / seconds,
+        "run_reviews_per_sec": n_reviews / seconds,
+    }
+
+
+def execute(
+    fixtures_dir: Annotated[
+        str,
+        typer.Argument(
+            default=..., help="Directory of the pages recorded with run.py --record-dir"
+        ),
+    ],
+    repeat: Annotated[
+        int, typer.Option(help="Number of runs of each benchmark, the fastest is kept")
+    ] = 3,
+    output: Annotated[
+        str, typer.Option(help="Save the results to this JSON file")
+    ] = None,
+    baseline: Annotated[
+        str,
+        typer.Option(
+            help="JSON results of a previous run. Exits with an error when a result is slower by more than --tolerance"
+        ),
+    ] = None,
+    tolerance: Annotated[
+        float, typer.Option(help="Accepted slow down against the baseline, 0.2 = 20%")
+    ] = 0.2,
+    since: Annotated[
+        str,
+        typer.Option(
+            help="since (YYYY-MM-DD) of a recording made with a date window, it is not in the recorded urls"
+        ),
+    ] = None,
+    until: Annotated[
+        str,
+        typer.Option(
+            help="until (YYYY-MM-DD) of a recording made with a date window, it is not in the recorded urls"
+        ),
+    ] = None,
+):
+    pages = load_fixtures(fixtures_dir)
+    reviews = []
+    for content in pages.values():
+        reviews.extend(parse_page(0, content, "bs4")["reviews"])
+    print(f"Fixtures: {len(pages)} pages, {len(reviews)} reviews")
+
+    results = {}
+    results.update(bench_parse(pages, repeat))
+    results.update(bench_dates(reviews, repeat))
+    results.update(bench_csv(reviews, repeat))
+    window = {k: v for k, v in {"since": since, "until": until}.items() if v}
+    results.update(bench_end_to_end(pages, repeat, window))
+
+    previous = {}
+    if baseline:
+        with open(baseline, "r") as file:
+            previous = json.load(file)
+
+    regressions = []
+    for name, value in results.items():
+        line = f"{name:<36}{value:>14,.1f}"
+        if name in previous:
+            change = value / previous[name] - 1
+            line += f"  {change:+.0%}"
+            if change < -tolerance:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+
+    if output:
+        with open(output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if regressions:
+        print(f"Slower than the baseline: {', '.join(regressions)}")
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    typer.run(execute)